@@ -0,0 +1,184 @@
+"""Measuring the real widgets against one database, in this process.
+
+Run by benchmarks/__main__.py in a fresh process for each database, so that
+the peak memory use is that of one database alone.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import os
+import sys
+import json
+import time
+import resource
+import tempfile
+import argparse
+
+# Nothing is drawn to the screen, but everything is still painted
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtCore import Qt, QSettings, QEventLoop  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+
+def spin(condition, timeout=600):
+    """Run the event loop until condition() is true. Returns False if it
+    still wasn't after timeout seconds.
+    """
+    app = QApplication.instance()
+    end = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > end:
+            return False
+        app.processEvents(QEventLoop.AllEvents | QEventLoop.WaitForMoreEvents,
+                          50)
+    return True
+
+
+def settle():
+    """Handle every event which is waiting, including the paints they cause.
+    """
+    app = QApplication.instance()
+    app.sendPostedEvents()
+    app.processEvents()
+
+
+def timed(function, *args):
+    """Call function and return how long it took, in seconds."""
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def search(window, query):
+    """Search from the main window, and return how long it took until the
+    first row was painted.
+    """
+    results = window.results
+    finished = []
+    results.searchFinished.connect(finished.append)
+    start = time.perf_counter()
+    results.doSearch(query)
+    if not spin(lambda: finished):
+        raise RuntimeError("search for %r never finished" % query)
+    settle()
+    elapsed = time.perf_counter() - start
+    results.searchFinished.disconnect(finished.append)
+    if finished[0]:
+        raise RuntimeError(finished[0])
+    return elapsed
+
+
+def scrollCost(table, steps=200):
+    """Scroll through the table a page at a time, painting after every step,
+    and return the mean and worst time per step.
+    """
+    bar = table.verticalScrollBar()
+    bar.setValue(0)
+    settle()
+    times = []
+    for unused in range(steps):
+        if bar.value() >= bar.maximum():
+            break
+        start = time.perf_counter()
+        bar.setValue(bar.value() + bar.pageStep())
+        table.viewport().repaint()
+        settle()
+        times.append(time.perf_counter() - start)
+    if not times:
+        return {"steps": 0, "mean": 0.0, "max": 0.0}
+    return {"steps": len(times), "mean": sum(times) / len(times),
+            "max": max(times)}
+
+
+def sortCosts(table):
+    """Sort on each column both ways, and return how long each took until
+    the table was repainted.
+    """
+    costs = {}
+    model = table.model
+    for column in range(3):
+        name = model.headerData(column, Qt.Horizontal, Qt.DisplayRole)
+        for order, way in ((Qt.AscendingOrder, "ascending"),
+                           (Qt.DescendingOrder, "descending")):
+            start = time.perf_counter()
+            table.sortByColumn(column, order)
+            table.viewport().repaint()
+            settle()
+            costs["%s %s" % (name, way)] = time.perf_counter() - start
+    return costs
+
+
+def peakRSS():
+    """The most memory this process has used, in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024.0 * 1024.0)  # Bytes
+    return peak / 1024.0  # Kilobytes
+
+
+def measure(dbpath, query="*", width=1200, height=800):
+    """Open the database in a main window and return a dictionary of
+    measurements of searching, loading, scrolling and sorting.
+    """
+    # Keep the user's settings and caches out of it, and start from cold
+    scratch = tempfile.mkdtemp(prefix="xapers-qt-bench-")
+    os.environ["XDG_CACHE_HOME"] = os.path.join(scratch, "cache")
+    QSettings.setPath(QSettings.IniFormat, QSettings.UserScope, scratch)
+    QSettings.setPath(QSettings.NativeFormat, QSettings.UserScope, scratch)
+    app = QApplication(sys.argv[:1])
+    from xapers import Database
+    from xapersqt.MainWindow import MainWindow
+
+    db = Database(dbpath)
+    window = MainWindow(db, [])
+    window.resize(width, height)
+    settle()
+    table = window.results.papers
+    model = table.model
+    stats = {"database": dbpath, "documents": db.xapian.get_doccount(),
+             "query": query}
+    stats["time to first row"] = search(window, query)
+    stats["first page rows"] = model.loaded
+    stats["estimated rows"] = model.rowCount(None)
+    stats["time to first row (cached)"] = search(window, query)
+    stats["full load"] = (stats["time to first row"] +
+                          timed(model.fetchAll) + timed(settle))
+    stats["rows"] = model.rowCount(None)
+    stats["scroll repaint"] = scrollCost(table)
+    stats["sort"] = sortCosts(table)
+    stats["peak RSS (MB)"] = peakRSS()
+    window.close()
+    app.quit()
+    return stats
+
+
+def main():
+    """Measure one database and print the results as JSON."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.Bench")
+    parser.add_argument("database")
+    parser.add_argument("--query", default="*")
+    args = parser.parse_args()
+    json.dump(measure(args.database, args.query), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Generating synthetic Xapers databases to benchmark against.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import os
+import random
+import argparse
+
+from xapers import Database
+from xapers.documents import Document
+
+from xapersqt.Importer import indexFile
+
+
+SYLLABLES = ["an", "ber", "ca", "dal", "en", "fo", "gar", "hol", "is", "jo",
+             "ka", "lin", "mar", "nor", "ol", "pet", "qui", "ros", "son",
+             "ter", "ul", "van", "wil", "xi", "yan", "zh"]
+TOPICS = ["graph", "matching", "kidney", "exchange", "integer", "programming",
+          "scheduling", "heuristic", "network", "flow", "polytope", "cut",
+          "branch", "bound", "column", "generation", "stochastic", "robust",
+          "approximation", "algorithm", "complexity", "lattice", "random",
+          "spectral", "planar", "colouring", "routing", "vehicle", "quantum",
+          "learning", "optimisation", "decomposition", "benders", "dual"]
+
+
+def zipf(rng, items, s=1.1):
+    """Return a function which picks k distinct items, with popular items
+    (those near the start of the list) much more likely to be picked, as
+    happens with real authors and tags.
+    """
+    weights = [1.0 / (rank + 1) ** s for rank in range(len(items))]
+
+    def pick(k):
+        chosen = []
+        while len(chosen) < min(k, len(items)):
+            item = rng.choices(items, weights)[0]
+            if item not in chosen:
+                chosen.append(item)
+        return chosen
+    return pick
+
+
+def names(rng, count):
+    """Return count distinct made-up surnames."""
+    found = set()
+    while len(found) < count:
+        found.add("".join(rng.choice(SYLLABLES)
+                          for unused in range(rng.randint(2, 3))).title())
+    return sorted(found)
+
+
+class Corpus(object):
+    """Generates the documents of a synthetic database. The same size and
+    seed always give the same documents. Authors and tags are drawn from
+    Zipf-like distributions, most documents have one PDF, some have none and
+    a few have several, and a few have no year.
+    """
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.authors = names(self.rng, max(50, size // 5))
+        self.tags = ["tag%d" % i for i in range(max(20, size // 500))]
+        self.pickAuthors = zipf(self.rng, self.authors)
+        self.pickTags = zipf(self.rng, self.tags)
+
+    def title(self):
+        """A made-up title."""
+        words = self.rng.sample(TOPICS, self.rng.randint(3, 9))
+        return " ".join(words).capitalize()
+
+    def text(self):
+        """Made-up text for a PDF."""
+        return " ".join(self.rng.choice(TOPICS) for unused in range(200))
+
+    def bibtex(self, number):
+        """A made-up bibtex entry for document number."""
+        authors = self.pickAuthors(self.rng.choices([1, 2, 3, 4, 6, 12],
+                                                    [20, 30, 25, 15, 7, 3])[0])
+        fields = ["title = {%s}" % self.title(),
+                  "author = {%s}" % " and ".join(
+                      "%s, %s." % (name, self.rng.choice("ABCDEFGHJKLMNP"))
+                      for name in authors)]
+        if self.rng.random() > 0.03:
+            fields.append("year = {%d}" % int(2020 - self.rng.expovariate(
+                1 / 12.0) % 50))
+        return "@article{bench%d,\n  %s\n}\n" % (number, ",\n  ".join(fields))
+
+    def write(self, path, batchSize=1000, progress=None):
+        """Create the database at path and fill it with documents.
+        progress, if given, is called with the number of documents written
+        after each commit.
+        """
+        db = Database(path, writable=True, create=True)
+        try:
+            for number in range(self.size):
+                doc = Document(db)
+                doc.add_bibtex(self.bibtex(number))
+                tags = self.pickTags(self.rng.choices([0, 1, 2, 3, 5],
+                                                      [10, 35, 30, 15, 10])[0])
+                if tags:
+                    doc.add_tags(tags)
+                files = self.rng.choices([0, 1, 2, 3], [10, 80, 8, 2])[0]
+                for index in range(files):
+                    name = "paper%d-%d.pdf" % (number, index)
+                    data = b"%PDF-1.4\n% xapers-qt benchmark " + name.encode()
+                    indexFile(doc, name, data, self.text())
+                doc.sync()
+                if (number + 1) % batchSize == 0:
+                    db.xapian.commit()
+                    if progress is not None:
+                        progress(number + 1)
+            db.xapian.commit()
+        finally:
+            db.xapian.close()
+
+
+def corpusPath(directory, size, seed=0):
+    """Where the database of the given size and seed is kept."""
+    return os.path.join(directory, "corpus-%d-%d" % (size, seed))
+
+
+def ensureCorpus(directory, size, seed=0, progress=None):
+    """Return the path of a database of the given size and seed, generating
+    it first unless an earlier run already did. A database is only used once
+    it has been completely written.
+    """
+    path = corpusPath(directory, size, seed)
+    done = os.path.join(path, ".complete")
+    if not os.path.exists(done):
+        if os.path.exists(path):
+            raise RuntimeError("%s was left half written, remove it and run "
+                               "again" % path)
+        os.makedirs(path)
+        Corpus(size, seed).write(path, progress=progress)
+        open(done, "w").close()
+    return path
+
+
+def main():
+    """Generate a corpus from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.Corpus",
+        description="Generate a synthetic Xapers database.")
+    parser.add_argument("directory")
+    parser.add_argument("size", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(ensureCorpus(args.directory, args.size, args.seed,
+                       lambda done: print("%d documents" % done)))
+
+
+if __name__ == "__main__":
+    main()
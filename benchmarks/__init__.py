@@ -0,0 +1,30 @@
+"""Benchmarks of xapers-qt, run against synthetic databases.
+
+Run them with
+
+    python -m benchmarks [--sizes 1000 10000 100000] [--output FILE]
+
+which prints (or writes) the measurements as JSON. Two such files can be
+compared with
+
+    python -m benchmarks --compare OLD NEW
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
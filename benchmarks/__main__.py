@@ -0,0 +1,108 @@
+"""Runs the benchmarks if called as a module."""
+
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+
+from benchmarks.Corpus import ensureCorpus
+
+
+def runOne(dbpath, query):
+    """Measure one database in a fresh process, and return its results."""
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    output = subprocess.check_output(
+        [sys.executable, "-m", "benchmarks.Bench", dbpath, "--query", query],
+        env=env)
+    return json.loads(output.decode())
+
+
+def flatten(stats, prefix=""):
+    """Turn nested measurements into a flat dictionary of numbers."""
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, prefix + key + " / "))
+        elif isinstance(value, float):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(old, new):
+    """Print how each measurement changed between two runs."""
+    with open(old) as f:
+        before = {run["documents"]: flatten(run) for run in json.load(f)["runs"]}
+    with open(new) as f:
+        after = {run["documents"]: flatten(run) for run in json.load(f)["runs"]}
+    for size in sorted(set(before) & set(after)):
+        print("%d documents" % size)
+        for key in sorted(set(before[size]) & set(after[size])):
+            was, now = before[size][key], after[size][key]
+            change = (now / was - 1) * 100 if was else 0.0
+            print("  %-45s %10.4f %10.4f %+7.1f%%" % (key, was, now, change))
+
+
+def main():
+    """Generate any missing databases, measure each of them, and report."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure xapers-qt against synthetic databases.")
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[1000, 10000, 100000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--query", default="*")
+    parser.add_argument("--corpora", default=os.path.join(
+        os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+        "xapers-qt", "benchmarks"), help="where generated databases are kept")
+    parser.add_argument("--output", help="write JSON here, not to stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare the JSON of two earlier runs")
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    report = {"started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "seed": args.seed, "runs": []}
+    for size in args.sizes:
+        sys.stderr.write("Preparing %d documents...\n" % size)
+        path = ensureCorpus(args.corpora, size, args.seed, lambda done:
+                            sys.stderr.write("  %d written\n" % done))
+        sys.stderr.write("Measuring %d documents...\n" % size)
+        report["runs"].append(runOne(path, args.query))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
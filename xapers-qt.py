@@ -2,7 +2,7 @@
 
 
 import sys
-from xapersqt import XapersQt
+from xapersqt.Startup import fromArguments
 
 
 dbpath = '~/.xapers/docs'
@@ -13,7 +13,11 @@ KEYBINDS = [["Ctrl+L", "Search"], ["j", "Next"], ["k", "Prev"],
 
 
 def main(args):
-    app = XapersQt.XapersQt(sys.argv, dbpath, KEYBINDS)
+    profile = fromArguments(args)
+    from xapersqt import XapersQt
+    if profile is not None:
+        profile.mark("modules imported")
+    app = XapersQt.XapersQt(args, dbpath, KEYBINDS, profile)
     assert app
     sys.exit(app.exec_())
 
@@ -0,0 +1,104 @@
+"""Changing many documents at once.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from xapersqt.Writable import openWritable, LOCK_ERRORS
+
+
+# The fields which can be set on many documents at once, and how
+FIELDS = {"Title": lambda doc, value: doc.set_title(value),
+          "Year": lambda doc, value: doc.set_year(value),
+          "Key": lambda doc, value: doc.set_key(value)}
+
+
+def addTag(tag):
+    """An edit adding a tag to a document."""
+    return lambda doc: doc.add_tags([tag])
+
+
+def removeTag(tag):
+    """An edit removing a tag from a document."""
+    return lambda doc: doc.remove_tags([tag])
+
+
+def setField(field, value):
+    """An edit setting one of FIELDS of a document."""
+    return lambda doc: FIELDS[field](doc, value)
+
+
+class BatchSignals(QObject):
+    """The signals of a BatchWorker."""
+    # Documents changed so far, and how many there are to change
+    progress = pyqtSignal(int, int)
+    # An error message, or an empty string if all went well
+    finished = pyqtSignal(str)
+
+
+class BatchWorker(QRunnable):
+    """Applies one edit to many documents, in a thread pool, through one
+    writable handle and with one commit at the end. The changes to the
+    Xapian index are made in one transaction, so either every document is
+    changed there or none is. Document.sync() also rewrites each document's
+    bibtex and tag files as it goes, though, and those are not put back if
+    a later document fails.
+    """
+    def __init__(self, dbpath, docids, edit):
+        super(BatchWorker, self).__init__()
+        self.dbpath = dbpath
+        self.docids = docids
+        self.edit = edit
+        self.signals = BatchSignals()
+
+    def run(self):
+        """Inherited from QRunnable."""
+        try:
+            db = openWritable(self.dbpath)
+        except LOCK_ERRORS:
+            self.signals.finished.emit("The database is locked")
+            return
+        try:
+            db.xapian.begin_transaction(False)
+        except Exception as e:  # pylint: disable=broad-except
+            db.xapian.close()
+            self.signals.finished.emit(str(e))
+            return
+        try:
+            try:
+                for count, docid in enumerate(self.docids, 1):
+                    doc = db[docid]
+                    if doc is None:
+                        continue
+                    self.edit(doc)
+                    doc.sync()
+                    if count % 100 == 0:
+                        self.signals.progress.emit(count, len(self.docids))
+            except Exception:
+                db.xapian.cancel_transaction()
+                raise
+            db.xapian.commit_transaction()
+            db.xapian.commit()
+        except Exception as e:  # pylint: disable=broad-except
+            self.signals.finished.emit(str(e))
+            return
+        finally:
+            db.xapian.close()
+        self.signals.finished.emit("")
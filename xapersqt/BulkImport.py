@@ -0,0 +1,308 @@
+"""Importing whole directories of PDFs as new documents.
+
+Can also be run without the GUI:
+
+    python -m xapersqt.BulkImport [--db PATH] [--batch N] [--tag TAG] DIR
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import os
+import sys
+import time
+import sqlite3
+import hashlib
+import argparse
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from xapers import Database
+from xapers.documents import Document
+
+from xapersqt.DisplayCache import cacheDir
+from xapersqt.Importer import extractors, extractText, indexFile
+from xapersqt.Writable import openWritable
+
+
+def findPDFs(directory):
+    """Return the paths of all PDFs in or below directory, in a stable
+    order.
+    """
+    found = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith('.pdf'):
+                found.append(os.path.join(root, name))
+    return found
+
+
+def hashFile(path):
+    """Return the SHA-1 of the file at path. Run in an extractor process."""
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def hashFiles(pool, paths):
+    """Hash each of the files at paths in pool, yielding (path, hash) in
+    order. The hash of a file which can't be read is None, and the error is
+    reported, so that one bad file doesn't stop the others being hashed.
+    """
+    futures = [pool.submit(hashFile, path) for path in paths]
+    for path, future in zip(paths, futures):
+        try:
+            yield path, future.result()
+        except OSError as e:
+            sys.stderr.write("Could not read %s: %s\n" % (path, e))
+            yield path, None
+
+
+class ImportState(object):
+    """What is known about the files in a database, kept in an SQLite file
+    so that a bulk import can pick up where it left off. The hash of files
+    already in the database is remembered, along with its size and
+    modification time so that it is only hashed again when it changes.
+    Files are only hashed once some file being imported is the same size.
+    """
+    def __init__(self, uuid):
+        path = os.path.join(cacheDir(), 'import-%s.sqlite' % uuid)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=5)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS files "
+                              "(path TEXT PRIMARY KEY, mtime REAL, "
+                              "size INTEGER, sha1 TEXT)")
+
+    def knownHashes(self, db, sizes, status=None):
+        """Return the set of hashes of the files in the database whose size
+        is one of sizes. Other files can't be the same as any of the files
+        being imported, so are never hashed. status, if given, is called
+        with a description of how the hashing is going.
+        """
+        hashes = set()
+        stale = []
+        for doc in db.search('*'):
+            for path in doc.get_fullpaths():
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                if info.st_size not in sizes:
+                    continue
+                row = self.conn.execute("SELECT mtime, size, sha1 FROM files "
+                                        "WHERE path = ?", (path,)).fetchone()
+                if row and row[0] == info.st_mtime and row[1] == info.st_size:
+                    hashes.add(row[2])
+                else:
+                    stale.append((path, info))
+        paths = [path for path, info in stale]
+        for done, ((path, info), (unused, sha)) in enumerate(
+                zip(stale, hashFiles(extractors(), paths)), 1):
+            if sha is not None:
+                hashes.add(sha)
+                self.remember(path, info, sha)
+            if status is not None and (done % 100 == 0 or
+                                       done == len(paths)):
+                status("Checking library files: %d of %d hashed" %
+                       (done, len(paths)))
+        self.conn.commit()
+        return hashes
+
+    def remember(self, path, info, sha):
+        """Remember the hash of a file in the database."""
+        self.conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                          (path, info.st_mtime, info.st_size, sha))
+
+
+def bulkImport(dbpath, directory, batchSize=50, tags=None, progress=None,
+               cancelled=None, status=None):
+    """Add every PDF in or below directory to the database at dbpath as a
+    new document, skipping files whose contents are already in the
+    database. Files are hashed and their text extracted in parallel, and the
+    documents written through one writable handle, committing every
+    batchSize documents. An interrupted import can simply be run again.
+
+    progress, if given, is called as progress(done, total, imported) after
+    each file. cancelled, if given, is called regularly, and the import
+    stops (keeping what has been written) once it returns True. status, if
+    given, is called with a description of the step before importing
+    starts.
+
+    Returns a dictionary of statistics about the import.
+    """
+    start = time.time()
+    paths = findPDFs(directory)
+    sizes = set()
+    for path in paths:
+        try:
+            sizes.add(os.path.getsize(path))
+        except OSError:
+            pass
+    db = Database(dbpath)
+    state = ImportState(db.xapian.get_uuid())
+    if status is not None:
+        status("Checking library files against %d PDFs" % len(paths))
+    known = state.knownHashes(db, sizes, status)
+    db.xapian.close()
+    pool = extractors()
+    todo = []
+    failed = 0
+    for path, sha in hashFiles(pool, paths):
+        if sha is None:
+            failed += 1
+        elif sha not in known:
+            known.add(sha)  # Also skips duplicates within the directory
+            todo.append((path, sha))
+    stats = {'found': len(paths),
+             'skipped': len(paths) - len(todo) - failed,
+             'imported': 0, 'failed': failed}
+    done = stats['skipped'] + failed
+    # Don't let extracted text pile up faster than it can be written
+    window = 4 * (os.cpu_count() or 2)
+    wdb = openWritable(dbpath)
+    try:
+        pending = {}
+        written = 0
+        todo.reverse()
+        while todo or pending:
+            stop = cancelled is not None and cancelled()
+            while todo and not stop and len(pending) < window:
+                path, sha = todo.pop()
+                pending[pool.submit(extractText, path)] = (path, sha)
+            if stop:
+                for future in pending:
+                    future.cancel()
+                break
+            finished, unused = wait(list(pending),
+                                    return_when=FIRST_COMPLETED)
+            for future in finished:
+                path, sha = pending.pop(future)
+                done += 1
+                name = os.path.basename(path)
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                    doc = Document(wdb)
+                    indexFile(doc, name, data, future.result())
+                    if tags:
+                        doc.add_tags(tags)
+                    doc.sync()
+                except Exception as e:  # pylint: disable=broad-except
+                    stats['failed'] += 1
+                    sys.stderr.write("Could not import %s: %s\n" % (path, e))
+                    if progress is not None:
+                        progress(done, len(paths), stats['imported'])
+                    continue
+                # The copy in the database needn't be hashed next time
+                for copy in doc.get_fullpaths():
+                    if os.path.basename(copy) == name:
+                        state.remember(copy, os.stat(copy), sha)
+                stats['imported'] += 1
+                written += 1
+                if written % batchSize == 0:
+                    wdb.xapian.commit()
+                    state.conn.commit()
+                if progress is not None:
+                    progress(done, len(paths), stats['imported'])
+        wdb.xapian.commit()
+    finally:
+        wdb.xapian.close()
+        state.conn.commit()
+    stats['seconds'] = time.time() - start
+    stats['rate'] = stats['imported'] / max(stats['seconds'], 1e-6)
+    return stats
+
+
+class BulkImportSignals(QObject):
+    """The signals of a BulkImportWorker."""
+    # Files done, files found, documents imported
+    progress = pyqtSignal(int, int, int)
+    # A description of the step before importing starts
+    status = pyqtSignal(str)
+    # The statistics of the import, or an error message
+    finished = pyqtSignal(object)
+
+
+class BulkImportWorker(QRunnable):
+    """Runs a bulk import in a thread pool."""
+    def __init__(self, dbpath, directory):
+        super(BulkImportWorker, self).__init__()
+        self.dbpath = dbpath
+        self.directory = directory
+        self.stop = False
+        self.signals = BulkImportSignals()
+
+    def cancel(self):
+        """Stop the import once the files being read have been written."""
+        self.stop = True
+
+    def run(self):
+        """Inherited from QRunnable."""
+        try:
+            stats = bulkImport(self.dbpath, self.directory,
+                               progress=self.signals.progress.emit,
+                               cancelled=lambda: self.stop,
+                               status=self.signals.status.emit)
+        except Exception as e:  # pylint: disable=broad-except
+            stats = str(e)
+        self.signals.finished.emit(stats)
+
+
+def main(argv):
+    """Run a bulk import from the command line."""
+    parser = argparse.ArgumentParser(
+        prog="python -m xapersqt.BulkImport",
+        description="Add every PDF in a directory to a Xapers database.")
+    parser.add_argument("directory")
+    parser.add_argument("--db", default=os.environ.get('XAPERS_ROOT',
+                                                       '~/.xapers/docs'))
+    parser.add_argument("--batch", type=int, default=50,
+                        help="documents per commit")
+    parser.add_argument("--tag", action="append", default=[],
+                        help="tag to add to every new document")
+    args = parser.parse_args(argv[1:])
+
+    def report(done, total, imported):
+        rate = imported / max(time.time() - start, 1e-6)
+        sys.stdout.write("\r%d/%d files, %d imported, %.1f docs/s" %
+                         (done, total, imported, rate))
+        sys.stdout.flush()
+
+    def status(message):
+        sys.stdout.write("\r%-72s" % message)
+        sys.stdout.flush()
+
+    start = time.time()
+    try:
+        stats = bulkImport(os.path.expanduser(args.db), args.directory,
+                           args.batch, args.tag, report, status=status)
+    except KeyboardInterrupt:
+        sys.stdout.write("\nInterrupted. Run again to carry on.\n")
+        return 1
+    sys.stdout.write("\n%(found)d found, %(imported)d imported, "
+                     "%(skipped)d already present, %(failed)d failed, "
+                     "in %(seconds).1fs (%(rate).1f docs/s)\n" % stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,135 @@
+"""Suggesting authors, tags and title words as a search is typed.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+from bisect import bisect_left
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from xapersqt.Timings import instrument
+
+
+# The search prefix of each field that is suggested, and whether its terms
+# are lower case (and so should be matched without regard to case). Xapers
+# indexes authors and titles word by word, so both are suggested one
+# lower case word at a time: "author:smith", never "author:John Smith".
+FIELDS = [("author", True), ("tag", False), ("title", True)]
+# At most this many terms starting with what was typed are looked at, so
+# that a lookup takes the same time however many terms there are
+SCAN = 500
+
+
+class CompletionIndex(object):
+    """Sorted lists of the terms of each field, with how many documents have
+    each term, so that all terms starting with some text can be found by
+    bisection.
+    """
+    def __init__(self, fields=None):
+        # Field name: (sorted terms, document count of each term)
+        self.fields = fields or {}
+
+    @staticmethod
+    def build(db):
+        """Build an index of the author, tag and title terms of db."""
+        fields = {}
+        for field, unused in FIELDS:
+            prefix = db._find_prefix(field)
+            terms = []
+            counts = []
+            # allterms() gives terms in sorted order already
+            for item in db.xapian.allterms(prefix):
+                terms.append(item.term[len(prefix):].decode('utf-8',
+                                                            'replace'))
+                counts.append(item.termfreq)
+            fields[field] = (terms, counts)
+        return CompletionIndex(fields)
+
+    def lookup(self, field, start, limit=10):
+        """Return up to limit terms of field starting with start, the most
+        common first.
+        """
+        if field not in self.fields or not start:
+            return []
+        terms, counts = self.fields[field]
+        first = bisect_left(terms, start)
+        found = []
+        for position in range(first, min(first + SCAN, len(terms))):
+            if not terms[position].startswith(start):
+                break
+            found.append(position)
+        found.sort(key=counts.__getitem__, reverse=True)
+        return [terms[position] for position in found[:limit]]
+
+    def complete(self, text, limit=10):
+        """Return completions of the last word of a search. A word given as
+        field:start is completed from that field, any other word from all of
+        them.
+        """
+        head, space, word = text.rpartition(" ")
+        head += space
+        field, colon, start = word.partition(":")
+        if colon:
+            lower = dict(FIELDS).get(field)
+            if lower is None:
+                return []
+            if lower:
+                start = start.lower()
+            return [head + field + ":" + term
+                    for term in self.lookup(field, start, limit)]
+        found = []
+        for field, lower in FIELDS:
+            start = word.lower() if lower else word
+            terms, counts = self.fields.get(field, ([], []))
+            for term in self.lookup(field, start, limit):
+                count = counts[bisect_left(terms, term)]
+                if field == "title":
+                    found.append((count, head + term))
+                else:
+                    found.append((count, head + field + ":" + term))
+        found.sort(key=lambda pair: pair[0], reverse=True)
+        return [completion for unused, completion in found[:limit]]
+
+
+class IndexSignals(QObject):
+    """The signals of an IndexBuilder."""
+    # The new CompletionIndex
+    built = pyqtSignal(object)
+
+
+class IndexBuilder(QRunnable):
+    """Builds a CompletionIndex in a thread pool."""
+    def __init__(self, dbpath):
+        super(IndexBuilder, self).__init__()
+        self.dbpath = dbpath
+        self.signals = IndexSignals()
+
+    def run(self):
+        """Inherited from QRunnable."""
+        from xapersqt.SearchWorker import readDatabase
+        try:
+            index = CompletionIndex.build(readDatabase(self.dbpath))
+        except Exception:  # pylint: disable=broad-except
+            # Only suggestions are lost, so carry on without them
+            index = CompletionIndex()
+        self.signals.built.emit(index)
+
+
+instrument(CompletionIndex, "complete")
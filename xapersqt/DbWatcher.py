@@ -0,0 +1,83 @@
+"""Noticing when the database is changed by another program.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import os
+
+from PyQt5.QtCore import QObject, QFileSystemWatcher, QTimer, pyqtSignal
+
+
+class DbWatcher(QObject):
+    """Watches the Xapian files behind a database, and emits changed whenever
+    the database reaches a new revision. The read-only handle is reopened
+    first, so it already sees the new revision when changed is emitted.
+
+    Files being written set off a quick check of the revision. In case the
+    file system doesn't report changes, the revision is also checked every
+    few seconds anyway.
+    """
+    # Emitted with nothing, as revisions don't fit in a C int
+    changed = pyqtSignal()
+
+    def __init__(self, db, interval=5000):
+        super(DbWatcher, self).__init__()
+        self.db = db
+        self.revision = db.xapian.get_revision()
+        self.path = os.path.join(db.root, '.xapers')
+        self.watcher = QFileSystemWatcher(self)
+        self.watchFiles()
+        self.watcher.directoryChanged.connect(self.poke)
+        self.watcher.fileChanged.connect(self.poke)
+        # A write touches several files, so wait for them all to settle
+        self.settle = QTimer(self)
+        self.settle.setSingleShot(True)
+        self.settle.setInterval(200)
+        self.settle.timeout.connect(self.check)
+        self.poll = QTimer(self)
+        self.poll.setInterval(interval)
+        self.poll.timeout.connect(self.check)
+        self.poll.start()
+
+    def watchFiles(self):
+        """Watch the database directory and every file in it. Xapian
+        replaces some files when committing, so this is redone after each
+        change.
+        """
+        if not os.path.isdir(self.path):
+            return
+        paths = [self.path] + [os.path.join(self.path, name)
+                               for name in os.listdir(self.path)]
+        watched = set(self.watcher.files() + self.watcher.directories())
+        new = [path for path in paths if path not in watched]
+        if new:
+            self.watcher.addPaths(new)
+
+    def poke(self, unused):
+        """Something in the database directory changed."""
+        self.settle.start()
+
+    def check(self):
+        """Reopen the database and emit changed if its revision moved."""
+        self.db.xapian.reopen()
+        revision = self.db.xapian.get_revision()
+        if revision != self.revision:
+            self.revision = revision
+            self.watchFiles()
+            self.changed.emit()
@@ -0,0 +1,117 @@
+"""A cache on disk of the fields shown for each document.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import os
+import sqlite3
+import threading
+
+
+# SQLite can only take so many parameters in one statement
+CHUNK = 500
+
+
+def cacheDir():
+    """The directory xapers-qt keeps its caches in."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'xapers-qt')
+
+
+class DisplayCache(object):
+    """The title, authors, year and number of files of documents, keyed by
+    docid and kept in an SQLite file. The cache belongs to one database
+    (identified by its UUID), and is emptied whenever that database is found
+    at a different revision to the one the cache was filled from.
+
+    There is one connection to the file, opened when first needed, and a
+    lock which is held while it is used, so one DisplayCache can be shared
+    by the GUI and worker threads.
+    """
+    def __init__(self, uuid):
+        self.uuid = uuid
+        self.path = os.path.join(cacheDir(), 'display-%s.sqlite' % uuid)
+        self.conn = None
+        self.lock = threading.Lock()
+
+    def connection(self):
+        """Return the connection, opening it if needed. The lock must be
+        held.
+        """
+        conn = self.conn
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5,
+                                   check_same_thread=False)
+            conn.execute("CREATE TABLE IF NOT EXISTS meta "
+                         "(name TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS docs "
+                         "(docid INTEGER PRIMARY KEY, title TEXT, "
+                         "authors TEXT, year TEXT, files INTEGER)")
+            conn.commit()
+            self.conn = conn
+        return conn
+
+    def close(self):
+        """Close the connection, if it is open."""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def validate(self, revision):
+        """Make sure nothing is returned that was read from any revision of
+        the database but this one.
+        """
+        with self.lock, self.connection() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE name = 'uuid'"
+                               ).fetchone()
+            uuid = row[0] if row else None
+            row = conn.execute("SELECT value FROM meta "
+                               "WHERE name = 'revision'").fetchone()
+            cached = row[0] if row else None
+            if uuid == self.uuid and cached == str(revision):
+                return
+            conn.execute("DELETE FROM docs")
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                             [('uuid', self.uuid),
+                              ('revision', str(revision))])
+
+    def get(self, docids):
+        """Return a dictionary mapping each of the given docids which are in
+        the cache to a tuple of (title, authors, year, files).
+        """
+        found = {}
+        with self.lock:
+            conn = self.connection()
+            for start in range(0, len(docids), CHUNK):
+                chunk = docids[start:start + CHUNK]
+                query = ("SELECT docid, title, authors, year, files FROM docs "
+                         "WHERE docid IN (%s)" % ",".join("?" * len(chunk)))
+                for row in conn.execute(query, chunk):
+                    found[row[0]] = row[1:]
+        return found
+
+    def put(self, records):
+        """Store the fields of the given DocRecords."""
+        with self.lock, self.connection() as conn:
+            conn.executemany("INSERT OR REPLACE INTO docs "
+                             "VALUES (?, ?, ?, ?, ?)",
+                             [(r.docid, r.title, r.authors, r.year, r.files)
+                              for r in records])
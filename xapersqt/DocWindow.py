@@ -6,8 +6,13 @@ import os
 import gettext
 from PyQt5.QtWidgets import (QWidget, QShortcut, QDialogButtonBox, QFileDialog,
                              QMessageBox)
-from PyQt5.QtGui import QKeySequence
+from PyQt5.QtGui import QKeySequence, QPixmap
+from PyQt5.QtCore import QObject, pyqtSignal
 
+from xapersqt.Importer import Importer
+from xapersqt.Snapshots import snapshots
+from xapersqt.Thumbnails import thumbnails
+from xapersqt.Writable import writableDatabase, LOCK_ERRORS
 from xapersqt.ui_DocWindow import Ui_DocWindow
 
 
@@ -15,23 +20,45 @@ gettext.bindtextdomain('xapers-qt', '/path/to/my/language/directory')
 gettext.textdomain('xapers-qt')
 _ = gettext.gettext
 
+_windows = None
+
+
+def docWindows():
+    """The DocWindows shared by every table of results."""
+    global _windows  # pylint: disable=global-statement
+    if _windows is None:
+        _windows = DocWindows()
+    return _windows
+
 
 class DocWindow(QWidget):
-    """A window showing details (and allowing editing) of one document.
+    """A window showing details (and allowing editing) of one document, given
+    its DocSnapshot. Whenever the snapshot is replaced, because the document
+    was saved here or changed elsewhere, the window follows it. A closed
+    window can be given another document with setDoc() and shown again.
     """
+    # Emitted with this window once it has been closed
+    closed = pyqtSignal(object)
+    # Emitted once every file being added has been saved (or given up on)
+    idle = pyqtSignal()
+
     def __init__(self, doc, keybinds=None):
         super(DocWindow, self).__init__()
-        self.doc = doc
+        self.doc = None
         self.shortcuts = []
         self.modified = False
         self.ui = Ui_DocWindow()
         self.ui.setupUi(self)
-        self.setup_doc()
         self.tag_list = self.ui.tag_list
         self.pdfs = self.ui.pdf_list
         self.pdfs.set_doc_window(self)
-        self.pdfs.set_doc(self.doc)
-        self.refresh_tags()
+        self.importer = Importer(snapshots().db)
+        self.importer.committed.connect(self.filesAdded)
+        self.jobs = []
+        self.previewPath = None
+        thumbnails().ready.connect(self.thumbnailReady)
+        snapshots().changed.connect(self.docChanged)
+        self.setDoc(doc)
         self.ui.buttonBox.accepted.connect(self.saveAndClose)
         (self.ui.buttonBox.button(QDialogButtonBox.Discard)
          .clicked.connect(self.resetAndClose))
@@ -39,6 +66,30 @@ class DocWindow(QWidget):
             self.setupKeybinds(keybinds)
         self.show()
 
+    def setDoc(self, doc):
+        """Show (and edit) the document with the given snapshot."""
+        self.doc = doc
+        self.modified = False
+        self.setup_doc()
+        self.pdfs.set_doc(doc)
+        self.showPreview()
+        self.refresh_tags()
+
+    def clear(self):
+        """Forget the document being shown, and everything shown about it,
+        so that the window can be used for another document.
+        """
+        self.doc = None
+        self.jobs = []
+        self.previewPath = None
+        self.ui.preview.clear()
+        self.pdfs.set_doc(None)
+        self.pdfs.clearJobs()
+
+    def busy(self):
+        """Whether files are still being added to the document."""
+        return bool(self.jobs)
+
     def setup_doc(self):
         """Setup the labels referring to the document."""
         self.ui.key.setText(self.doc.get_key())
@@ -46,9 +97,9 @@ class DocWindow(QWidget):
         self.ui.year.setText(self.doc.get_year())
 
     def saveAndClose(self):
-        """Save changes and close."""
-        self.saveChanges()
-        self.close()
+        """Save changes and close, unless they couldn't be saved."""
+        if self.saveChanges():
+            self.close()
 
     def resetAndClose(self):
         """Reset any changes, and close."""
@@ -58,20 +109,60 @@ class DocWindow(QWidget):
         self.modified = False
         self.close()
 
+    def showPreview(self):
+        """Show the first page of the document's first PDF, once it has been
+        rendered.
+        """
+        try:
+            self.previewPath = self.doc.get_fullpaths()[0]
+        except IndexError:
+            self.previewPath = None
+            self.ui.preview.clear()
+            return
+        thumbnail = thumbnails().get(self.previewPath)
+        if thumbnail is None:
+            self.ui.preview.clear()
+        else:
+            self.ui.preview.setPixmap(QPixmap(thumbnail))
+
+    def thumbnailReady(self, path):
+        """A thumbnail was rendered, which may be the one we're waiting for.
+        """
+        if path == self.previewPath:
+            self.showPreview()
+
     def refresh_tags(self):
         """Refresh the list of tags."""
         text = " ".join(chr(0x1F3F7 + tag) for tag in self.doc.get_tags())
         self.tag_list.setText(text)
 
     def addPDF(self):
-        """Add a new PDF to this document."""
-        fileName, group = QFileDialog.getOpenFileName(self, _("Open PDF"),
-                                                      str(), "PDFs (*.pdf)")
-        if fileName:
+        """Add new PDFs to this document."""
+        fileNames, group = QFileDialog.getOpenFileNames(self, _("Open PDF"),
+                                                        str(), "PDFs (*.pdf)")
+        for fileName in fileNames:
             if os.path.exists(fileName):
-                self.doc.add_file(fileName)
-                self.modified = True
-        self.pdfs.refresh()
+                self.addFile(fileName)
+
+    def addFile(self, path):
+        """Start adding a file to this document. The text is extracted and
+        the document saved in the background.
+        """
+        job = self.importer.add(self.doc.docid, path)
+        self.jobs.append(job)
+        job.changed.connect(self.jobChanged)
+        self.pdfs.addJob(job)
+
+    def jobChanged(self):
+        """Forget about files which have been added, or given up on."""
+        self.jobs = [job for job in self.jobs if not job.finished()]
+        if not self.jobs:
+            self.idle.emit()
+
+    def filesAdded(self):
+        """Files being added in the background have been saved."""
+        if self.doc is not None:  # Closed and kept as a spare since
+            self.reload()
 
     def setupKeybinds(self, binds):
         """Setup any shortcuts."""
@@ -92,7 +183,7 @@ class DocWindow(QWidget):
         mime = event.mimeData()
         if mime.hasUrls():
             urls = mime.urls()
-            if len(urls) == 1 and urls[0].toString()[-4:] == ".pdf":
+            if urls and all(url.toString()[-4:] == ".pdf" for url in urls):
                 event.accept()
             else:
                 event.ignore()
@@ -100,9 +191,9 @@ class DocWindow(QWidget):
             event.ignore()
 
     def dropEvent(self, event):
-        self.doc.add_file(event.mimeData().urls()[0].path())
-        self.modified = True
-        self.pdfs.refresh()
+        """Qt override to add the dropped PDF files."""
+        for url in event.mimeData().urls():
+            self.addFile(url.path())
 
     def closeEvent(self, event):
         """Window being closed. Save if changes are detected."""
@@ -116,13 +207,113 @@ class DocWindow(QWidget):
             m = QMessageBox.question(self, "Save changes?",
                                      ("Do you want to save the changes you "
                                       "made to this document?"))
-            if m == QMessageBox.Yes:
-                self.saveChanges()
+            if m == QMessageBox.Yes and not self.saveChanges():
+                # Stay open, so that the changes aren't lost
+                event.ignore()
+                return
+        self.closed.emit(self)
 
     def saveChanges(self):
-        """Save any changes made to the document."""
-        self.doc.set_key(self.lines["Key"].text())
-        self.doc.set_title(self.lines["Title"].text())
-        self.doc.set_year(self.lines["Year"].text())
-        self.doc.sync()
+        """Save any changes made to the document. Returns whether they were
+        saved.
+        """
+        try:
+            with writableDatabase(snapshots().db) as db:
+                doc = db[self.doc.docid]
+                doc.set_key(self.ui.key.text())
+                doc.set_title(self.ui.title.text())
+                doc.set_year(self.ui.year.text())
+                doc.sync()
+        except LOCK_ERRORS:
+            self.lockedWarning()
+            return False
         self.modified = False
+        self.reload()
+        return True
+
+    def lockedWarning(self):
+        """Tell the user that changes could not be saved."""
+        QMessageBox.warning(self, _("Database locked"),
+                            _("The database is being written to by another "
+                              "program, so changes could not be saved. "
+                              "Please try again."))
+
+    def reload(self):
+        """Read the document again, through the read-only handle, after it
+        has been changed through a writable one. Every view of it, this one
+        included, is then sent the new snapshot.
+        """
+        snapshots().refresh(self.doc.docid)
+
+    def docChanged(self, doc):
+        """Show the new snapshot of a document, if it is this one. Fields
+        being edited are left alone.
+        """
+        if self.doc is None or doc.docid != self.doc.docid:
+            return
+        self.doc = doc
+        self.pdfs.set_doc(doc)
+        self.showPreview()
+        self.refresh_tags()
+
+
+class DocWindows(QObject):
+    """The open DocWindows, one per document. Opening a document which
+    already has a window brings that window to the front. Closed windows
+    are kept to be used again for other documents, up to spares of them,
+    and the rest let go of (once any files they were adding are saved).
+    """
+    def __init__(self, spares=2):
+        super(DocWindows, self).__init__()
+        self.spares = spares
+        self.open = {}
+        self.closed = []
+        self.finishing = []
+
+    def show(self, doc):
+        """Show a window for the document with the given snapshot."""
+        window = self.open.get(doc.docid)
+        if window is None:
+            finishing = [w for w in self.finishing
+                         if w.doc.docid == doc.docid]
+            if finishing:
+                # Still adding files to this document, so carry on in it
+                window = finishing[0]
+                self.finishing.remove(window)
+            elif self.closed:
+                window = self.closed.pop()
+                window.setDoc(doc)
+            else:
+                window = DocWindow(doc)
+                window.closed.connect(self.windowClosed)
+                window.idle.connect(self.windowIdle)
+            self.open[doc.docid] = window
+        window.show()
+        window.raise_()
+        window.activateWindow()
+        return window
+
+    def windowClosed(self, window):
+        """A window was closed, so keep it for later or let it go."""
+        if window.doc is None or window in self.finishing:
+            return  # Already closed
+        if self.open.get(window.doc.docid) is window:
+            del self.open[window.doc.docid]
+        if window.busy():
+            self.finishing.append(window)
+        else:
+            self.keep(window)
+
+    def windowIdle(self):
+        """A closed window has finished adding files."""
+        for window in [w for w in self.finishing if not w.busy()]:
+            self.finishing.remove(window)
+            self.keep(window)
+
+    def keep(self, window):
+        """Keep a closed window as a spare, if there is room for it."""
+        if len(self.closed) < self.spares:
+            window.clear()
+            self.closed.append(window)
+        else:
+            window.deleteLater()
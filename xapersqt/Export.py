@@ -0,0 +1,135 @@
+"""Exporting the results of a search to a file.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import csv
+import json
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from xapersqt.ResultSet import ResultSet
+from xapersqt.SearchWorker import readDatabase
+
+
+# The file dialog filter for each format
+FILTERS = {"bibtex": "BibTeX (*.bib)",
+           "csv": "CSV (*.csv)",
+           "jsonl": "JSON Lines (*.jsonl)"}
+
+COLUMNS = ["docid", "key", "title", "authors", "year", "tags", "files"]
+
+
+def fields(doc):
+    """Return a dictionary of the fields of a document which are exported
+    to CSV and JSON Lines.
+    """
+    return {"docid": doc.docid,
+            "key": doc.get_key(),
+            "title": doc.get_title(),
+            "authors": doc.get_authors(),
+            "year": doc.get_year(),
+            "tags": doc.get_tags(),
+            "files": doc.get_files()}
+
+
+class BibtexWriter(object):
+    """Writes documents as BibTeX entries."""
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, doc):
+        """Write one document. Documents with no BibTeX are skipped."""
+        bibtex = doc.get_bibtex()
+        if bibtex:
+            self.f.write(bibtex.strip() + "\n\n")
+
+
+class CsvWriter(object):
+    """Writes documents as rows of a CSV file."""
+    def __init__(self, f):
+        self.writer = csv.writer(f)
+        self.writer.writerow(COLUMNS)
+
+    def write(self, doc):
+        """Write one document. Lists are joined with semicolons."""
+        row = fields(doc)
+        self.writer.writerow(["; ".join(row[col])
+                              if isinstance(row[col], list) else row[col]
+                              for col in COLUMNS])
+
+
+class JsonLinesWriter(object):
+    """Writes documents as one JSON object per line."""
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, doc):
+        """Write one document."""
+        self.f.write(json.dumps(fields(doc)) + "\n")
+
+
+WRITERS = {"bibtex": BibtexWriter,
+           "csv": CsvWriter,
+           "jsonl": JsonLinesWriter}
+
+
+class ExportSignals(QObject):
+    """The signals of an ExportWorker."""
+    # Documents written so far, and roughly how many there are in total
+    progress = pyqtSignal(int, int)
+    # An error message, or an empty string if all went well
+    finished = pyqtSignal(str)
+
+
+class ExportWorker(QRunnable):
+    """Writes every document matching a query to a file, in a thread pool.
+    Documents are written as they are read, so the size of the export
+    doesn't affect memory use.
+    """
+    def __init__(self, dbpath, query, path, fmt):
+        super(ExportWorker, self).__init__()
+        self.dbpath = dbpath
+        self.query = query
+        self.path = path
+        self.fmt = fmt
+        self.stop = False
+        self.signals = ExportSignals()
+
+    def cancel(self):
+        """Stop exporting. What has been written so far is kept."""
+        self.stop = True
+
+    def run(self):
+        """Inherited from QRunnable."""
+        try:
+            results = ResultSet(readDatabase(self.dbpath), self.query)
+            total = results.estimate()
+            with open(self.path, 'w', newline='') as f:
+                writer = WRITERS[self.fmt](f)
+                for count, doc in enumerate(results.documents(), 1):
+                    if self.stop:
+                        break
+                    writer.write(doc)
+                    if count % 100 == 0:
+                        self.signals.progress.emit(count, max(total, count))
+        except Exception as e:  # pylint: disable=broad-except
+            self.signals.finished.emit(str(e))
+            return
+        self.signals.finished.emit("")
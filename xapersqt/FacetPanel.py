@@ -0,0 +1,67 @@
+"""The panel for narrowing a search by tag or year.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+from PyQt5.QtWidgets import QDockWidget, QTreeWidget, QTreeWidgetItem
+from PyQt5.QtCore import Qt, pyqtSignal
+
+
+class FacetPanel(QDockWidget):
+    """Lists the tags and years of the documents matching the current
+    search, with how many matches have each. Activating one (by
+    double-clicking it, or pressing Enter on it) narrows the search down to
+    it.
+    """
+    # Emitted with a query term, such as tag:to-read or year:2019
+    narrow = pyqtSignal(str)
+
+    def __init__(self, parent):
+        super(FacetPanel, self).__init__("Facets", parent)
+        self.setObjectName("facetPanel")
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.itemActivated.connect(self.activated)
+        self.setWidget(self.tree)
+
+    def setFacets(self, facets):
+        """Show a new set of counts."""
+        self.tree.clear()
+        tags = QTreeWidgetItem(self.tree, ["Tags"])
+        for tag, count in sorted(facets['tag'].items(),
+                                 key=lambda item: (-item[1], item[0])):
+            self.addItem(tags, tag, count, "tag")
+        years = QTreeWidgetItem(self.tree, ["Years"])
+        for year, count in sorted(facets['year'].items(), reverse=True):
+            self.addItem(years, str(year), count, "year")
+        tags.setExpanded(True)
+        years.setExpanded(True)
+
+    def addItem(self, parent, value, count, prefix):
+        """Add one tag or year to the tree."""
+        item = QTreeWidgetItem(parent, ["%s (%d)" % (value, count)])
+        if " " in value:
+            value = '"%s"' % value
+        item.setData(0, Qt.UserRole, "%s:%s" % (prefix, value))
+
+    def activated(self, item, unused):
+        """Narrow the search to the tag or year clicked on."""
+        term = item.data(0, Qt.UserRole)
+        if term:
+            self.narrow.emit(term)
@@ -0,0 +1,287 @@
+"""Adding files to documents in the background.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import os
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from xapers.parser import parse_data
+
+from xapersqt.Writable import openWritable, LOCK_ERRORS
+
+
+# Text extraction is CPU-bound, so is done in other processes. Writing to
+# Xapian is done by one thread, as only one handle can hold the write lock.
+_extractors = None
+_writers = None
+
+
+def extractors():
+    """The process pool which extracts text from files."""
+    global _extractors  # pylint: disable=global-statement
+    if _extractors is None:
+        # Forking a process with Qt's threads running is asking for trouble
+        context = multiprocessing.get_context('spawn')
+        workers = max(1, (os.cpu_count() or 2) - 1)
+        _extractors = ProcessPoolExecutor(workers, mp_context=context)
+    return _extractors
+
+
+def writers():
+    """The thread pool, of one thread, which writes to Xapian."""
+    global _writers  # pylint: disable=global-statement
+    if _writers is None:
+        _writers = QThreadPool()
+        _writers.setMaxThreadCount(1)
+    return _writers
+
+
+def extractText(path):
+    """Return the text of the file at path. Run in an extractor process."""
+    with open(path, 'rb') as f:
+        return parse_data(f.read())
+
+
+def indexFile(doc, name, data, text):
+    """Add a file to a document, as Document.add_file_data() does, but with
+    the text already extracted. Like that, the file is only copied into the
+    document's directory by doc.sync().
+    """
+    doc._gen_terms(None, text)
+    summary = text[0:997]
+    if len(text) > 997:
+        summary += '...'
+    doc._set_data(summary)
+    doc._add_term(doc.db._find_prefix('file'), name)
+    doc._infiles[name] = data
+
+
+class ImportJob(QObject):
+    """One file being added to a document."""
+    QUEUED, EXTRACTING, INDEXING, DONE, FAILED, CANCELLED = range(6)
+
+    # Emitted whenever state (or message) changes
+    changed = pyqtSignal()
+    # Emitted, from an extractor's thread, with the text of the file or the
+    # exception raised while extracting it
+    extracted = pyqtSignal(object)
+    # Emitted with this job once its text is ready to be written
+    ready = pyqtSignal(object)
+
+    def __init__(self, docid, path):
+        super(ImportJob, self).__init__()
+        self.docid = docid
+        self.path = path
+        self.name = os.path.basename(path)
+        self.state = ImportJob.QUEUED
+        self.message = ""
+        self.text = None
+        self.future = None
+        # Connected to a method of this object, not a lambda, so that Qt
+        # queues it up for the GUI thread
+        self.extracted.connect(self.textExtracted)
+
+    def setState(self, state, message=""):
+        """Move on to a new state."""
+        self.state = state
+        self.message = message
+        self.changed.emit()
+
+    def finished(self):
+        """Whether there is nothing more to be done for this job."""
+        return self.state in (ImportJob.DONE, ImportJob.FAILED,
+                              ImportJob.CANCELLED)
+
+    def cancel(self):
+        """Stop this job, if it hasn't been written yet."""
+        if self.finished() or self.state == ImportJob.INDEXING:
+            return
+        if self.future is not None:
+            self.future.cancel()
+        self.setState(ImportJob.CANCELLED)
+
+    def futureDone(self, future):
+        """Called from the extractor's thread when text extraction ends."""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.extracted.emit(error)
+        else:
+            self.extracted.emit(future.result())
+
+    def textExtracted(self, result):
+        """Text extraction finished, successfully or not."""
+        if self.state == ImportJob.CANCELLED:
+            return
+        if isinstance(result, Exception):
+            self.setState(ImportJob.FAILED, str(result))
+            return
+        self.text = result
+        self.ready.emit(self)
+
+
+class WriterSignals(QObject):
+    """The signals of a Writer."""
+    # Emitted with a job, its new state and a message, so that jobs are only
+    # ever changed in the GUI thread
+    state = pyqtSignal(object, int, str)
+    # Emitted after each commit
+    committed = pyqtSignal()
+    # Emitted once the writer has let go of the database, however it ended
+    finished = pyqtSignal()
+
+
+class Writer(QRunnable):
+    """Writes jobs whose text has been extracted to the database, through
+    one writable handle, committing every batchSize jobs. Jobs are only
+    marked done once they have been committed.
+    """
+    def __init__(self, dbpath, jobs, batchSize):
+        super(Writer, self).__init__()
+        self.dbpath = dbpath
+        self.jobs = jobs
+        self.batchSize = batchSize
+        self.signals = WriterSignals()
+
+    def run(self):
+        """Inherited from QRunnable."""
+        try:
+            self.write()
+        except Exception as e:  # pylint: disable=broad-except
+            self.failAll(str(e))
+        finally:
+            self.signals.finished.emit()
+
+    def write(self):
+        """Write every job waiting, until there are none left."""
+        try:
+            db = openWritable(self.dbpath)
+        except LOCK_ERRORS:
+            self.failAll("Database is locked")
+            return
+        written = []
+        try:
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job.state == ImportJob.CANCELLED:
+                    continue
+                self.signals.state.emit(job, ImportJob.INDEXING, "")
+                try:
+                    with open(job.path, 'rb') as f:
+                        data = f.read()
+                    doc = db[job.docid]
+                    indexFile(doc, job.name, data, job.text)
+                    doc.sync()
+                except Exception as e:  # pylint: disable=broad-except
+                    self.signals.state.emit(job, ImportJob.FAILED, str(e))
+                    continue
+                job.text = None
+                written.append(job)
+                if len(written) == self.batchSize:
+                    self.commit(db, written)
+                    written = []
+            self.commit(db, written)
+        except Exception as e:  # pylint: disable=broad-except
+            for job in written:
+                self.signals.state.emit(job, ImportJob.FAILED, str(e))
+            raise
+        finally:
+            db.xapian.close()
+
+    def commit(self, db, jobs):
+        """Commit, and mark the jobs written since the last commit done."""
+        db.xapian.commit()
+        for job in jobs:
+            self.signals.state.emit(job, ImportJob.DONE, "")
+        self.signals.committed.emit()
+
+    def failAll(self, message):
+        """Fail every job still waiting to be written."""
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            self.signals.state.emit(job, ImportJob.FAILED, message)
+
+
+class Importer(QObject):
+    """Adds files to documents of a database. Text is extracted by a pool of
+    processes, and the results are written in batches by a single writer.
+    """
+    # Emitted after changes have been committed and db reopened
+    committed = pyqtSignal()
+
+    def __init__(self, db, batchSize=20):
+        super(Importer, self).__init__()
+        self.db = db
+        self.batchSize = batchSize
+        self.ready = queue.Queue()
+        self.writing = False
+
+    def add(self, docid, path):
+        """Start adding the file at path to the document docid, and return
+        the ImportJob doing so.
+        """
+        job = ImportJob(docid, path)
+        job.ready.connect(self.textReady)
+        job.setState(ImportJob.EXTRACTING)
+        job.future = extractors().submit(extractText, path)
+        job.future.add_done_callback(job.futureDone)
+        return job
+
+    def textReady(self, job):
+        """The text of a job's file is ready to be written."""
+        self.ready.put(job)
+        if not self.writing:
+            self.startWriter()
+
+    def startWriter(self):
+        """Start a Writer on the jobs which are ready."""
+        self.writing = True
+        writer = Writer(self.db.root, self.ready, self.batchSize)
+        writer.signals.state.connect(self.jobState)
+        writer.signals.committed.connect(self.writerCommitted)
+        writer.signals.finished.connect(self.writerFinished)
+        writers().start(writer)
+
+    def jobState(self, job, state, message):
+        """The writer has moved a job on to a new state."""
+        job.setState(state, message)
+
+    def writerCommitted(self):
+        """A batch was committed, so let the read handle see it."""
+        self.db.xapian.reopen()
+        self.committed.emit()
+
+    def writerFinished(self):
+        """The writer has stopped. Start another if more jobs came in after
+        it last looked.
+        """
+        self.writing = False
+        if not self.ready.empty():
+            self.startWriter()
@@ -21,15 +21,25 @@ contained within it.
 # The author can be contacted at william@ewpettersson.se and issues can
 # be raised at https://github.com/WPettersson/xapers-qt/
 
+import re
+
+from xapersqt.FacetPanel import FacetPanel
+from xapersqt import Timings
 from xapersqt.ui_MainWindow import Ui_MainWindow
 
-from PyQt5.QtWidgets import QShortcut, QMainWindow
-from PyQt5.QtCore import Qt, QSettings
+from PyQt5.QtWidgets import (QShortcut, QMainWindow, QProgressBar,
+                             QFileDialog, QMessageBox, QProgressDialog,
+                             QInputDialog, QLabel)
+from PyQt5.QtCore import Qt, QSettings, QThreadPool, QTimer
 from PyQt5.QtGui import QKeySequence
 
 
 class MainWindow(QMainWindow):
-    """The main window, containing the search bar and results table."""
+    """The main window, containing the search bar and results table. It can
+    be shown before the database is opened, in which case db is None until
+    setDb() is called. Machinery which isn't needed to show the window is
+    only imported when it is first used.
+    """
     def __init__(self, db, keybinds):
         super(MainWindow, self).__init__()
         self.settings = QSettings("xapers-qt", "xapers-qt")
@@ -39,11 +49,57 @@ class MainWindow(QMainWindow):
         self.ui.setupUi(self)
         self.results = self.ui.resultsWidget
         self.searchBar = self.ui.searchBar
-        self.results.setDb(self.db)
+        # Whether a search was asked for before the database was open, and
+        # whether the table should then take the focus
+        self.searchWaiting = False
+        self.focusWaiting = False
         self.results.setSettings(self.settings)
+        self.searchBar.setSettings(self.settings)
+        self.busy = QProgressBar()
+        self.busy.setRange(0, 0)  # Just show that something is happening
+        self.busy.setMaximumWidth(100)
+        self.busy.hide()
+        self.ui.statusbar.addPermanentWidget(self.busy)
+        self.count = QLabel()
+        self.ui.statusbar.addPermanentWidget(self.count)
+        # Timings of the hot paths, if they are being recorded
+        self.timings = QLabel()
+        self.timings.hide()
+        self.ui.statusbar.addPermanentWidget(self.timings)
+        self.timingsTimer = QTimer(self)
+        self.timingsTimer.setInterval(1000)
+        self.timingsTimer.timeout.connect(self.showTimings)
+        self.tracePath = Timings.fromEnvironment()
+        self.results.searchStarted.connect(self.searchStarted)
+        self.results.searchFinished.connect(self.searchFinished)
+        self.results.countChanged.connect(self.count.setText)
+        self.facets = FacetPanel(self)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.facets)
+        self.facets.narrow.connect(self.narrowSearch)
+        self.facets.visibilityChanged.connect(self.facetsShown)
+        self.results.facetsReady.connect(self.facets.setFacets)
+        if not self.settings.value("main/facets", True, type=bool):
+            self.facets.hide()
+        self.results.wantFacets = not self.facets.isHidden()
+        self.bulkImport = None
+        self.export = None
+        self.exportProgress = None
+        self.batch = None
+        self.setupMenus()
         self.setupKeybinds(keybinds)
         self.restore_size()
         self.show()
+        if db is not None:
+            self.setDb(db)
+
+    def setDb(self, db):
+        """Set the database, and run any search that was waiting for it."""
+        self.db = db
+        self.results.setDb(db)
+        self.searchBar.setDb(db, self.results.watcher)
+        if self.searchWaiting:
+            self.searchWaiting = False
+            self.startSearch(self.focusWaiting)
 
     def restore_size(self):
         """Resize to size stored in settings.
@@ -58,9 +114,252 @@ class MainWindow(QMainWindow):
             height = 300
         self.resize(width, height)
 
-    def startSearch(self):
-        """Launches a search."""
-        self.results.doSearch(self.searchBar.text())
+    def setupMenus(self):
+        """Fill in the menu bar."""
+        fileMenu = self.ui.menubar.addMenu("&File")
+        self.importAction = fileMenu.addAction("&Import directory...")
+        self.importAction.triggered.connect(self.startBulkImport)
+        self.cancelImportAction = fileMenu.addAction("&Cancel import")
+        self.cancelImportAction.setEnabled(False)
+        self.cancelImportAction.triggered.connect(self.cancelBulkImport)
+        self.exportAction = fileMenu.addAction("&Export results...")
+        self.exportAction.triggered.connect(self.startExport)
+        editMenu = self.ui.menubar.addMenu("&Edit")
+        self.batchActions = [
+            editMenu.addAction("&Add tag to selected..."),
+            editMenu.addAction("&Remove tag from selected..."),
+            editMenu.addAction("&Set field of selected...")]
+        self.batchActions[0].triggered.connect(self.batchAddTag)
+        self.batchActions[1].triggered.connect(self.batchRemoveTag)
+        self.batchActions[2].triggered.connect(self.batchSetField)
+        viewMenu = self.ui.menubar.addMenu("&View")
+        viewMenu.addAction(self.facets.toggleViewAction())
+        debugMenu = self.ui.menubar.addMenu("&Debug")
+        self.timingAction = debugMenu.addAction("&Record timings")
+        self.timingAction.setCheckable(True)
+        self.timingAction.toggled.connect(self.recordTimings)
+        self.timingAction.setChecked(Timings.enabled())
+        debugMenu.addAction("Re&set timings").triggered.connect(
+            self.resetTimings)
+        debugMenu.addAction("Save &trace...").triggered.connect(
+            self.saveTrace)
+
+    def startBulkImport(self):
+        """Ask for a directory, and add every PDF in it as a new document in
+        the background.
+        """
+        directory = QFileDialog.getExistingDirectory(self,
+                                                     "Import directory")
+        if not directory or self.db is None:
+            return
+        from xapersqt.BulkImport import BulkImportWorker
+        self.bulkImport = BulkImportWorker(self.db.root, directory)
+        self.bulkImport.signals.progress.connect(self.bulkImportProgress)
+        self.bulkImport.signals.status.connect(self.ui.statusbar.showMessage)
+        self.bulkImport.signals.finished.connect(self.bulkImportFinished)
+        self.importAction.setEnabled(False)
+        self.cancelImportAction.setEnabled(True)
+        self.ui.statusbar.showMessage("Importing %s..." % directory)
+        QThreadPool.globalInstance().start(self.bulkImport)
+
+    def cancelBulkImport(self):
+        """Stop the bulk import that is running."""
+        if self.bulkImport:
+            self.bulkImport.cancel()
+
+    def bulkImportProgress(self, done, total, imported):
+        """Show how the bulk import is going."""
+        self.ui.statusbar.showMessage("Importing: %d of %d files read, "
+                                      "%d new documents" %
+                                      (done, total, imported))
+
+    def bulkImportFinished(self, stats):
+        """Report how the bulk import went."""
+        self.bulkImport = None
+        self.importAction.setEnabled(True)
+        self.cancelImportAction.setEnabled(False)
+        self.ui.statusbar.clearMessage()
+        if isinstance(stats, str):
+            QMessageBox.warning(self, "Import failed", stats)
+            return
+        QMessageBox.information(
+            self, "Import finished",
+            ("%(found)d PDFs found, %(imported)d imported, %(skipped)d "
+             "already present and %(failed)d failed, in %(seconds).1f "
+             "seconds (%(rate).1f documents per second)." % stats))
+
+    def startExport(self):
+        """Ask for a file, and write every match of the current search to it
+        in the background.
+        """
+        if self.results.query is None or self.export is not None:
+            return
+        from xapersqt.Export import ExportWorker, FILTERS
+        formats = list(FILTERS)
+        path, chosen = QFileDialog.getSaveFileName(
+            self, "Export results", "", ";;".join(FILTERS[fmt]
+                                                  for fmt in formats))
+        if not path:
+            return
+        fmt = formats[[FILTERS[f] for f in formats].index(chosen)]
+        self.export = ExportWorker(self.db.root, self.results.query, path,
+                                   fmt)
+        self.exportProgress = QProgressDialog("Exporting results...",
+                                              "Cancel", 0, 0, self)
+        self.exportProgress.setWindowModality(Qt.WindowModal)
+        self.exportProgress.canceled.connect(self.export.cancel)
+        self.export.signals.progress.connect(self.exportMoved)
+        self.export.signals.finished.connect(self.exportFinished)
+        self.exportProgress.show()
+        QThreadPool.globalInstance().start(self.export)
+
+    def exportMoved(self, done, total):
+        """Show how far through the export we are."""
+        if self.exportProgress is not None:
+            self.exportProgress.setMaximum(total)
+            self.exportProgress.setValue(done)
+
+    def exportFinished(self, message):
+        """Tidy up after an export, reporting any error."""
+        self.export = None
+        if self.exportProgress is not None:
+            self.exportProgress.reset()
+            self.exportProgress.deleteLater()
+            self.exportProgress = None
+        if message:
+            QMessageBox.warning(self, "Export failed", message)
+
+    def batchAddTag(self):
+        """Add a tag to every selected document."""
+        from xapersqt.BatchEdit import addTag
+        tag, ok = QInputDialog.getText(self, "Add tag", "Tag to add:")
+        if ok and tag:
+            self.startBatch(addTag(tag))
+
+    def batchRemoveTag(self):
+        """Remove a tag from every selected document."""
+        from xapersqt.BatchEdit import removeTag
+        tag, ok = QInputDialog.getText(self, "Remove tag", "Tag to remove:")
+        if ok and tag:
+            self.startBatch(removeTag(tag))
+
+    def batchSetField(self):
+        """Set a field of every selected document."""
+        from xapersqt.BatchEdit import FIELDS, setField
+        field, ok = QInputDialog.getItem(self, "Set field", "Field:",
+                                         sorted(FIELDS), 0, False)
+        if not ok:
+            return
+        value, ok = QInputDialog.getText(self, "Set field",
+                                         "New %s:" % field.lower())
+        if ok:
+            self.startBatch(setField(field, value))
+
+    def startBatch(self, edit):
+        """Apply an edit to every selected document in the background."""
+        docids = self.results.papers.selectedDocids()
+        if not docids or self.batch is not None:
+            return
+        from xapersqt.BatchEdit import BatchWorker
+        self.batch = BatchWorker(self.db.root, docids, edit)
+        self.batch.signals.progress.connect(self.batchProgress)
+        self.batch.signals.finished.connect(self.batchFinished)
+        for action in self.batchActions:
+            action.setEnabled(False)
+        self.ui.statusbar.showMessage("Changing %d documents..." %
+                                      len(docids))
+        self.busy.show()
+        QThreadPool.globalInstance().start(self.batch)
+
+    def batchProgress(self, done, total):
+        """Show how far through a batch edit we are."""
+        self.ui.statusbar.showMessage("Changing documents: %d of %d" %
+                                      (done, total))
+
+    def batchFinished(self, message):
+        """Tidy up after a batch edit, and show its changes."""
+        self.batch = None
+        for action in self.batchActions:
+            action.setEnabled(True)
+        self.busy.hide()
+        self.ui.statusbar.clearMessage()
+        if message:
+            QMessageBox.warning(self, "Changes not saved", message)
+        else:
+            self.results.watcher.check()
+
+    def recordTimings(self, on):
+        """Start or stop recording timings, showing them as they are."""
+        if on:
+            Timings.enable()
+            self.showTimings()
+            self.timings.show()
+            self.timingsTimer.start()
+        else:
+            Timings.disable()
+            self.timingsTimer.stop()
+            self.timings.hide()
+
+    def resetTimings(self):
+        """Forget the timings recorded so far."""
+        Timings.reset()
+        self.showTimings()
+
+    def showTimings(self):
+        """Show the slowest hot paths in the status bar, and all of them in
+        its tooltip.
+        """
+        rows = Timings.summary()
+        self.timings.setText(" | ".join(
+            "%s %.0fms" % (row[0].split(".")[-1], row[2] * 1000)
+            for row in rows[:3]))
+        self.timings.setToolTip("\n".join(Timings.describe(row)
+                                          for row in rows))
+
+    def saveTrace(self):
+        """Ask for a file, and write the timings to it as a Chrome trace."""
+        path, unused = QFileDialog.getSaveFileName(
+            self, "Save trace", "xapers-qt-trace.json",
+            "Chrome trace (*.json)")
+        if path:
+            Timings.saveTrace(path)
+
+    def startSearch(self, focus=False):
+        """Launches a search. With focus, the table of results takes the
+        focus once they are shown. Searches started while typing leave it in
+        the search bar.
+        """
+        if self.db is None:
+            self.searchWaiting = True
+            self.focusWaiting = focus
+            return
+        self.results.doSearch(self.searchBar.text(), focus=focus)
+
+    def narrowSearch(self, term):
+        """Add a term to the search, and search again, unless the search
+        already has it.
+        """
+        text = self.searchBar.text().strip()
+        if re.search(r"(^|\s)%s($|\s)" % re.escape(term), text):
+            return
+        self.searchBar.searchLine.setText((text + " " + term).strip())
+        self.searchBar.searchNow()
+
+    def facetsShown(self, visible):
+        """Only count facets while they can be seen."""
+        self.results.wantFacets = visible
+        if visible and self.results.query is not None:
+            self.results.countFacets()
+
+    def searchStarted(self):
+        """Show that a search is running."""
+        self.ui.statusbar.showMessage("Searching...")
+        self.busy.show()
+
+    def searchFinished(self, message):
+        """Show that the search has finished, along with any message."""
+        self.busy.hide()
+        self.ui.statusbar.showMessage(message)
 
     def setupKeybinds(self, binds):
         """Setup the keyboard shortcuts.
@@ -95,12 +394,15 @@ class MainWindow(QMainWindow):
         """Save any settings we may have changed."""
         self.settings.setValue("main/width", self.width())
         self.settings.setValue("main/height", self.height())
+        self.settings.setValue("main/facets", not self.facets.isHidden())
         self.results.saveSettings()
 
     def closeEvent(self, event):
         """Things to do when closing the window.
         """
         self.saveSettings()
+        if self.tracePath:
+            Timings.saveTrace(self.tracePath)
 
     def resizeEvent(self, resizeEvent):
         """Things to do when resizing the window.
@@ -1,8 +1,22 @@
 """Various UI elements for PDFs"""
 
+import os
+
 from PyQt5.QtWidgets import (QWidget, QBoxLayout, QPushButton, QLabel,
-                             QGridLayout)
+                             QProgressBar, QHBoxLayout, QVBoxLayout)
 from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from xapersqt.Importer import ImportJob
+
+
+def describeSize(size):
+    """A short, human readable description of a number of bytes."""
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return "%.0f %s" % (size, unit)
+        size /= 1024.0
+    return "%.1f GB" % size
 
 
 class PDFLabel(QLabel):
@@ -14,16 +28,129 @@ class PDFLabel(QLabel):
         self.setOpenExternalLinks(True)
 
 
+class CheckSignals(QObject):
+    """The signals of a FileChecker."""
+    # The generation of the check, and the size of each file (or None if it
+    # is missing) by path
+    checked = pyqtSignal(int, object)
+
+
+class FileChecker(QRunnable):
+    """Checks that files exist, and how big they are, in a thread pool, as
+    they may be on a slow or sleeping disk.
+    """
+    def __init__(self, paths, generation):
+        super(FileChecker, self).__init__()
+        self.paths = paths
+        self.generation = generation
+        self.signals = CheckSignals()
+
+    def run(self):
+        """Inherited from QRunnable."""
+        sizes = {}
+        for path in self.paths:
+            try:
+                sizes[path] = os.stat(path).st_size
+            except OSError:
+                sizes[path] = None
+        self.signals.checked.emit(self.generation, sizes)
+
+
+class PDFRow(QWidget):
+    """One PDF of a document: a link to it, its size, and a button to delete
+    it.
+    """
+    def __init__(self, name, path):
+        super(PDFRow, self).__init__()
+        self.label = PDFLabel(name, path)
+        self.size = QLabel()
+        self.delete = QPushButton()
+        self.delete.setIcon(QIcon.fromTheme("edit-delete"))
+        self.delete.setEnabled(False)  # TODO Delete this PDF
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label, 1)
+        layout.addWidget(self.size)
+        layout.addWidget(self.delete)
+        self.setLayout(layout)
+
+    def showSize(self, size):
+        """Show the size of the file, or that it is missing."""
+        if size is None:
+            self.size.setText("(missing)")
+        else:
+            self.size.setText("(%s)" % describeSize(size))
+
+
+class ImportRow(QWidget):
+    """Shows which stage a file being added has reached, with a button to
+    cancel it. Neither stage reports how far through it is, so the bar only
+    shows that something is happening.
+    """
+    MESSAGES = {ImportJob.QUEUED: "Waiting",
+                ImportJob.EXTRACTING: "Reading text",
+                ImportJob.INDEXING: "Indexing",
+                ImportJob.DONE: "Done",
+                ImportJob.FAILED: "Failed",
+                ImportJob.CANCELLED: "Cancelled"}
+
+    def __init__(self, job):
+        super(ImportRow, self).__init__()
+        self.job = job
+        self.label = QLabel()
+        self.progress = QProgressBar()
+        self.cancel = QPushButton()
+        self.cancel.setIcon(QIcon.fromTheme("process-stop"))
+        self.cancel.setToolTip("Cancel")
+        self.cancel.clicked.connect(self.job.cancel)
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress)
+        layout.addWidget(self.cancel)
+        self.setLayout(layout)
+        self.job.changed.connect(self.showState)
+        self.showState()
+
+    def showState(self):
+        """Show the current state of the job."""
+        state = self.job.state
+        text = "%s: %s" % (self.job.name, self.MESSAGES[state])
+        if self.job.message:
+            text += " (%s)" % self.job.message
+        self.label.setText(text)
+        if state in (ImportJob.EXTRACTING, ImportJob.INDEXING):
+            self.progress.setRange(0, 0)  # Busy, but with no way to tell how
+        else:
+            self.progress.setRange(0, 1)
+            self.progress.setValue(1 if self.job.finished() else 0)
+        self.cancel.setEnabled(not self.job.finished() and
+                               state != ImportJob.INDEXING)
+        if state in (ImportJob.DONE, ImportJob.CANCELLED):
+            self.hide()
+            self.deleteLater()
+
+
 class PDFList(QWidget):
-    """A list of PDFs for a document."""
+    """A list of PDFs for a document. When the document changes, only the
+    rows of files which were added or removed are changed.
+    """
     def __init__(self, parent):
         super(PDFList, self).__init__()
         self.doc = None
         self.doc_window = None
         self.parent = parent
         self.addButton = QPushButton("&Add PDF")
-        self.grid = QGridLayout()
+        # PDFRows by path, in the order they are shown
+        self.rows = {}
+        self.files = QVBoxLayout()
+        self.jobs = QVBoxLayout()
+        self.generation = 0
         self.layout = QBoxLayout(QBoxLayout.TopToBottom)
+        self.layout.addLayout(self.files)
+        self.layout.addLayout(self.jobs)
+        self.layout.addWidget(self.addButton)
+        self.setLayout(self.layout)
 
     def set_doc_window(self, doc_window):
         """Set the doc_window of this list of PDFs."""
@@ -36,25 +163,53 @@ class PDFList(QWidget):
         self.refresh()
 
     def refresh(self):
-        """Refresh list of PDF documents."""
-        item = self.grid.takeAt(0)
-        while item:
-            del item
-            item = self.grid.takeAt(0)
-        item = self.layout.takeAt(0)
-        while item:
-            del item
-            item = self.layout.takeAt(0)
-        files = self.doc.get_files()
-        paths = self.doc.get_fullpaths()
-        for index, (path, name) in enumerate(zip(paths, files)):
-            label = PDFLabel(name, path)
-            delete = QPushButton()
-            delete.setIcon(QIcon.fromTheme("edit-delete"))
-            delete.setText("")
-            delete.setEnabled(False)  # TODO Delete this PDF
-            self.grid.addWidget(label, index, 0)
-            self.grid.addWidget(delete, index, 1)
-        self.layout.addLayout(self.grid)
-        self.layout.addWidget(self.addButton)
-        self.setLayout(self.layout)
+        """Bring the list of PDFs up to date with the document. Rows of files
+        which are no longer there are deleted, rows of new files are made,
+        and the rest are left as they are. The sizes of the files are then
+        checked in the background.
+        """
+        if self.doc is None:
+            files, paths = [], []
+        else:
+            files = self.doc.get_files()
+            paths = self.doc.get_fullpaths()
+        wanted = dict(zip(paths, files))
+        for path in [path for path in self.rows if path not in wanted]:
+            row = self.rows.pop(path)
+            self.files.removeWidget(row)
+            row.deleteLater()
+        for index, path in enumerate(wanted):
+            row = self.rows.get(path)
+            if row is None:
+                row = self.rows[path] = PDFRow(wanted[path], path)
+                self.files.insertWidget(index, row)
+            elif self.files.indexOf(row) != index:
+                self.files.removeWidget(row)
+                self.files.insertWidget(index, row)
+        self.generation += 1
+        if paths:
+            checker = FileChecker(paths, self.generation)
+            checker.signals.checked.connect(self.filesChecked)
+            QThreadPool.globalInstance().start(checker)
+
+    def filesChecked(self, generation, sizes):
+        """Show the sizes of the files, unless the list has changed since
+        they were checked.
+        """
+        if generation != self.generation:
+            return
+        for path, size in sizes.items():
+            if path in self.rows:
+                self.rows[path].showSize(size)
+
+    def addJob(self, job):
+        """Show the progress of a file being added."""
+        self.jobs.addWidget(ImportRow(job))
+
+    def clearJobs(self):
+        """Remove the rows of every file added, including failed ones."""
+        while self.jobs.count():
+            row = self.jobs.takeAt(0).widget()
+            if row is not None:
+                row.hide()
+                row.deleteLater()
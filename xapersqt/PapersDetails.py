@@ -21,11 +21,15 @@
 
 import gettext
 from PyQt5.QtWidgets import (QTableView, QHeaderView, QAbstractItemView,
-                             QPushButton)
-from PyQt5.QtGui import QDesktopServices, QFont, QFontMetrics
-from PyQt5.QtCore import Qt, QAbstractItemModel, QModelIndex, QSize, QUrl
+                             QStyledItemDelegate, QStyleOptionButton, QStyle,
+                             QApplication, QToolTip)
+from PyQt5.QtGui import QDesktopServices, QFont, QFontMetrics, QCursor
+from PyQt5.QtCore import (Qt, QAbstractItemModel, QModelIndex, QSize, QUrl,
+                          QEvent, QTimer, pyqtSignal)
 
-from xapersqt.DocWindow import DocWindow
+from xapersqt.Snapshots import DocSnapshot, snapshots
+from xapersqt.Thumbnails import thumbnails
+from xapersqt.Timings import instrument
 
 
 gettext.bindtextdomain('xapers-qt', '/path/to/my/language/directory')
@@ -37,20 +41,118 @@ CONSTS['cols'] = 4
 
 HEADINGS = [_("Title"), _("Author(s)"), _("Year"), _("PDF")]
 
-
-class PDFButton(QPushButton):
-    """A button which opens a PDF."""
-    def __init__(self, url):
-        super(PDFButton, self).__init__()
-        self.url = url
-        self.setText("Open PDF")
-        self.setStyleSheet("margin: 5px;")
-        self.clicked.connect(self.openUrl)
-
-    def openUrl(self):
-        """Open the PDF associated with this button."""
-        path = "file://" + self.url
-        QDesktopServices.openUrl(QUrl(path))
+# The Xapers field behind each column, used to look up a value slot
+FIELDS = ["title", "author", "year", None]
+
+
+class DocRecord(object):
+    """The fields of a document which the table displays, read from Xapian
+    once when the row is loaded rather than on every repaint.
+    """
+    __slots__ = ('doc', 'docid', 'title', 'authors', 'year', 'files')
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.docid = doc.docid
+        self.load()
+
+    def load(self):
+        """(Re)read the displayed fields from the document."""
+        self.title = self.doc.get_title()
+        auth = self.doc.get_authors()
+        if len(auth) > 3:
+            self.authors = ", ".join(auth[0:2]) + " et al."
+        else:
+            self.authors = ", ".join(auth)
+        self.year = self.doc.get_year()
+        self.files = len(self.doc.get_files())
+
+    @staticmethod
+    def fromFields(docid, title, authors, year, files):
+        """Return a record built from fields which have already been read,
+        without the document itself.
+        """
+        record = DocRecord.__new__(DocRecord)
+        record.doc = None
+        record.docid = docid
+        record.title = title
+        record.authors = authors
+        record.year = year
+        record.files = files
+        return record
+
+    def detached(self):
+        """Return a copy of this record which doesn't hold on to the
+        document.
+        """
+        return DocRecord.fromFields(self.docid, self.title, self.authors,
+                                    self.year, self.files)
+
+
+def previewMarkup(thumbnail):
+    """Markup for a tooltip showing a thumbnail."""
+    return "<img src=\"%s\">" % thumbnail
+
+
+def yearKey(year):
+    """Turn the year of a document into an integer to sort by. Documents
+    without a (numeric) year sort first.
+    """
+    try:
+        return int(year)
+    except (TypeError, ValueError):
+        return -1
+
+
+class PDFDelegate(QStyledItemDelegate):
+    """Paints an "Open PDF" button in the PDF column of rows which have a PDF,
+    and opens the PDF when it is clicked. No widget is created per row, and
+    the path of the PDF is only looked up once the button is clicked.
+    """
+    def __init__(self, table):
+        super(PDFDelegate, self).__init__(table)
+        self.table = table
+        self.pressed = None
+
+    def buttonRect(self, option):
+        """The area of the cell which the button covers."""
+        return option.rect.adjusted(5, 5, -5, -5)
+
+    def paint(self, painter, option, index):
+        """Inherited from QStyledItemDelegate."""
+        record = self.table.model.record(index.row())
+        if record is None or not record.files:
+            super(PDFDelegate, self).paint(painter, option, index)
+            return
+        button = QStyleOptionButton()
+        button.rect = self.buttonRect(option)
+        button.text = _("Open PDF")
+        button.state = QStyle.State_Enabled
+        if self.pressed == index.row():
+            button.state |= QStyle.State_Sunken
+        else:
+            button.state |= QStyle.State_Raised
+        QApplication.style().drawControl(QStyle.CE_PushButton, button,
+                                         painter)
+
+    def editorEvent(self, event, model, option, index):
+        """Inherited from QStyledItemDelegate. Handle clicks on the button."""
+        record = model.record(index.row())
+        if record is None or not record.files:
+            return False
+        if event.type() not in (QEvent.MouseButtonPress,
+                                QEvent.MouseButtonRelease):
+            return False
+        if not self.buttonRect(option).contains(event.pos()):
+            self.pressed = None
+            return False
+        if event.type() == QEvent.MouseButtonPress:
+            self.pressed = index.row()
+        else:
+            if self.pressed == index.row():
+                self.table.openPDFRow(index.row())
+            self.pressed = None
+        return True
 
 
 class PapersTable(QTableView):
@@ -75,6 +177,9 @@ class PapersTable(QTableView):
         self.horizontalHeader().setSectionResizeMode(3, QHeaderView.Fixed)
         self.setSelectionBehavior(QAbstractItemView.SelectRows)
         self.horizontalHeader().sectionResized.connect(self.columnResize)
+        self.setItemDelegateForColumn(3, PDFDelegate(self))
+        self.verticalScrollBar().valueChanged.connect(self.scrolled)
+        self.model.sortDropped.connect(self.sortDropped)
 
     def set_settings(self, settings):
         """Set the settings."""
@@ -84,39 +189,79 @@ class PapersTable(QTableView):
             self.titleProportion = float(setting)
         except ValueError:
             self.titleProportion = 0.6
+        try:
+            setting = self.settings.value("table/pageSize", 200)
+            self.model.pageSize = max(1, int(setting))
+        except ValueError:
+            self.model.pageSize = 200
+        if self.settings.value("table/thumbnails", True, type=bool):
+            self.model.thumbnails = thumbnails()
+            self.model.thumbnails.ready.connect(self.thumbnailReady)
         self.setColumnWidth(0, self.titleProportion * self.width())
 
+    def scrolled(self, unused):
+        """Rows have scrolled out of view, so don't bother rendering their
+        thumbnails.
+        """
+        if self.model.thumbnails is not None:
+            self.model.thumbnails.cancel()
+            self.model.hoverPath = None
+
+    def thumbnailReady(self, path):
+        """Show the thumbnail if the mouse is still over its row."""
+        if path == self.model.hoverPath:
+            QToolTip.showText(QCursor.pos(), previewMarkup(
+                self.model.thumbnails.get(path)), self)
+
     def columnResize(self, col, old, new):
         """Inherited from QTableView. Record how wide the title is.
         """
         if col == 0:
             self.titleProportion = float(new) / self.width()
 
-    def add_results(self, docs):
-        """Set a list of documents as the results to be showin in this table.
+    def add_results(self, results, records=None, estimate=None, focus=False):
+        """Set a ResultSet as the results to be shown in this table. Only the
+        first page of documents is read now (unless its DocRecords, and the
+        estimated number of matches, are given), the rest are fetched as the
+        table is scrolled. With focus, the table takes the focus, which
+        searches started while typing don't want.
         """
-        listed = list(docs)
-        count = 0
-        self.model.setDoc(listed)
-        for document in listed:
-            try:
-                button = PDFButton(document.get_fullpaths()[0])
-                # Third column is PDF
-                self.setIndexWidget(self.model.index(count, 3, 0), button)
-            except IndexError:  # No PDF file found
-                pass
-            count += 1
+        self.model.setResults(results, records, estimate)
         self.selectRow(0)
-        self.setFocus()
+        if focus:
+            self.setFocus()
+
+    def refreshResults(self):
+        """Bring the results up to date after the database has changed,
+        reading again only the rows in view.
+        """
+        first = max(self.rowAt(0), 0)
+        last = self.rowAt(self.viewport().height() - 1)
+        if last < 0:
+            last = self.model.rowCount(None) - 1
+        self.model.refreshResults(first,
+                                  min(last, first + self.model.pageSize - 1))
+
+    def sortDropped(self):
+        """Stop showing a sort which the rows no longer follow."""
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+
+    def selectedDocids(self):
+        """Return the docids of all selected documents."""
+        rows = [index.row() for index in self.selectionModel().selectedRows()]
+        return [self.model.record(row).docid for row in rows
+                if self.model.load(row)]
 
     def selectNext(self):
         """Select the next document."""
         try:
             index = self.selectionModel().selectedRows()[0]
-            self.selectRow(index.row()+1)
         except IndexError:
-            # No more documents, or possibly no selected document
-            pass
+            # Possibly no selected document
+            return
+        # Reads the next page, if the next row hasn't been read yet
+        if self.model.load(index.row() + 1):
+            self.selectRow(index.row() + 1)
 
     def selectPrev(self):
         """Select the previous document."""
@@ -129,10 +274,12 @@ class PapersTable(QTableView):
 
     def openDoc(self):
         """Open a window showing the details of a document."""
+        # Not needed until the first document is opened
+        from xapersqt.DocWindow import docWindows
         try:
             index = self.selectionModel().selectedRows()[0]
-            doc = self.model.docs[index.row()]
-            return DocWindow(doc)
+            doc = self.model.getDoc(index.row())
+            return docWindows().show(doc)
         except IndexError:
             # Possibly no selected document
             pass
@@ -141,12 +288,19 @@ class PapersTable(QTableView):
         """Open a PDF of the highlighted document."""
         try:
             index = self.selectionModel().selectedRows()[0]
-            doc = self.model.docs[index.row()]
-            url = doc.get_fullpaths()[0]
+            self.openPDFRow(index.row())
+        except IndexError:
+            # Possibly no selected document
+            pass
+
+    def openPDFRow(self, row):
+        """Open a PDF of the document in the given row."""
+        try:
+            url = self.model.getDoc(row).get_fullpaths()[0]
             path = "file://" + url
             QDesktopServices.openUrl(QUrl(path))
         except IndexError:
-            # Possibly no selected document, or no PDF associated with it
+            # No PDF associated with this document
             pass
 
     def saveSettings(self):
@@ -160,23 +314,306 @@ class PapersTable(QTableView):
 
 class PapersModel(QAbstractItemModel):
     """Represents an individual paper/document in the table."""
+    # Emitted when the number of results, or the estimate of it, changes
+    countChanged = pyqtSignal()
+    # Emitted when the rows go back to Xapian's order after being sorted
+    sortDropped = pyqtSignal()
+
     def __init__(self):
         super(PapersModel, self).__init__()
         metric = QFontMetrics(QFont())
         # TODO Could probably be done better
         self.yearWidth = metric.width("8888") + 10
         self.PDFwidth = metric.width("Open PDF") + 33
-        self.docs = []
-
-    def setDoc(self, docs):
-        """Set the (xapian) documents which occurs here."""
+        self.pageSize = 200
+        self.results = None
+        # How many rows the view is told there are. Until the last match has
+        # been read this comes from Xapian's estimate of the number of
+        # matches, and once it has, exact is the true number.
+        self.estimate = 0
+        self.exact = None
+        self.total = 0
+        # Pages of records which have been read, by page number, so that a
+        # row can be read without reading every row before it. loaded is the
+        # position just past the last match read. wanted holds the pages
+        # which the view asked for before they were read.
+        self.pages = {}
+        self.loaded = 0
+        self.wanted = set()
+        # Where a column is sorted here rather than by Xapian, the position
+        # of the match shown in each row, which column and direction that
+        # is, and the sort key of every match for each column sorted on.
+        self.order = None
+        self.sorting = None
+        self.sortKeys = {}
+        # Thumbnails, if they are shown, and the PDF whose thumbnail was
+        # last asked for by hovering over it
+        self.thumbnails = None
+        self.hoverPath = None
+        snapshots().changed.connect(self.refreshDoc)
+
+    def setResults(self, results, records=None, estimate=None):
+        """Set the ResultSet whose documents occur here, and read the first
+        page of them, unless the DocRecords of that page (and the estimated
+        number of matches) are given.
+        """
         self.beginResetModel()
-        self.docs = list(docs)  # Create a copy of the list
+        self.results = results
+        self.readFirstPage(records, estimate)
         self.endResetModel()
+        self.countChanged.emit()
+
+    def clearPages(self):
+        """Forget every record read so far."""
+        self.pages = {}
+        self.loaded = 0
+        self.wanted = set()
+        self.estimate = 0
+        self.exact = None
+        self.order = None
+        self.sorting = None
+        self.sortKeys = {}
+
+    def readFirstPage(self, records=None, estimate=None):
+        """Replace all records with the first page of the results."""
+        self.clearPages()
+        if records is None:
+            records = self.results.records(0, self.pageSize)
+            estimate = self.results.estimated
+        self.storePage(0, records, estimate)
+        self.total = self.countRows()
+
+    def storePage(self, page, records, estimate):
+        """Keep the records of a page, and refine the number of matches."""
+        self.pages[page] = records
+        offset = page * self.pageSize
+        self.loaded = max(self.loaded, offset + len(records))
+        if len(records) < self.pageSize:
+            # Xapian has seen every match by now, so its estimate is exact
+            if records:
+                self.exact = offset + len(records)
+            else:
+                self.exact = min(estimate or 0, offset)
+        elif estimate is not None:
+            self.estimate = estimate
+
+    def readPage(self, page):
+        """Read a page of documents, without telling the view."""
+        records = self.results.records(page * self.pageSize, self.pageSize)
+        self.storePage(page, records, self.results.estimated)
+
+    def readAll(self):
+        """Read every page not read yet, without telling the view."""
+        page = 0
+        while self.exact is None or page * self.pageSize < self.exact:
+            if page not in self.pages:
+                self.readPage(page)
+            page += 1
+
+    def countRows(self):
+        """How many rows there are, as far as is known."""
+        if self.exact is not None:
+            return self.exact
+        return max(self.loaded, self.estimate)
+
+    def countText(self):
+        """Describe how many results there are."""
+        if self.results is None:
+            return ""
+        if self.exact is not None:
+            return _("%d results") % self.exact
+        return _("about %d results") % self.total
+
+    def position(self, row):
+        """Return the position among the matches of the match shown in a
+        row.
+        """
+        if self.order is None:
+            return row
+        return self.order[row]
+
+    def recordAt(self, position):
+        """Return the DocRecord of the match at a position, or None if it
+        hasn't been read.
+        """
+        records = self.pages.get(position // self.pageSize)
+        if records is None or position < 0:
+            return None
+        try:
+            return records[position % self.pageSize]
+        except IndexError:
+            return None
+
+    def rowsOf(self):
+        """Return the row of every record which has been read, by docid."""
+        rows = {}
+        for page, records in self.pages.items():
+            for position, record in enumerate(records, page * self.pageSize):
+                rows[record.docid] = position
+        if self.order is not None:
+            shown = {position: row for row, position in enumerate(self.order)}
+            rows = {docid: shown[position]
+                    for docid, position in rows.items()}
+        return rows
+
+    def want(self, row):
+        """Have the page holding a row read once painting is over."""
+        if self.order is not None:
+            return
+        page = row // self.pageSize
+        if page in self.pages or page in self.wanted:
+            return
+        self.wanted.add(page)
+        if len(self.wanted) == 1:
+            QTimer.singleShot(0, self.readWanted)
+
+    def readWanted(self):
+        """Read the pages which the view asked for, and show them."""
+        wanted, self.wanted = self.wanted, set()
+        if self.results is None:
+            return
+        for page in sorted(wanted):
+            if page in self.pages:
+                continue
+            if self.exact is not None and page * self.pageSize >= self.exact:
+                continue
+            self.readPage(page)
+            self.pageChanged(page)
+        self.settle()
+
+    def pageChanged(self, page):
+        """Tell the view that the rows of a page have been read."""
+        first = page * self.pageSize
+        last = min(first + self.pageSize, self.total) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0, None),
+                                  self.index(last, CONSTS['cols'] - 1, None))
+
+    def load(self, row):
+        """Make sure the given row has been read, and return whether there is
+        such a row. This reads Xapian there and then, so it must not be used
+        while painting.
+        """
+        if row < 0 or self.results is None:
+            return False
+        if self.exact is not None and row >= self.exact:
+            return False
+        page = row // self.pageSize
+        # Once sorted here, every match has been read already
+        if self.order is None and page not in self.pages:
+            self.readPage(page)
+            self.pageChanged(page)
+            self.settle()
+        return self.record(row) is not None
+
+    def settle(self):
+        """Tell the view how many rows there now are."""
+        count = self.countRows()
+        if count > self.total:
+            self.beginInsertRows(QModelIndex(), self.total, count - 1)
+            self.total = count
+            self.endInsertRows()
+        elif count < self.total:
+            self.beginRemoveRows(QModelIndex(), count, self.total - 1)
+            self.total = count
+            self.endRemoveRows()
+        self.countChanged.emit()
+
+    def canFetchMore(self, parent):
+        """Inherited from QAbstractItemModel
+        """
+        return self.results is not None and self.exact is None
+
+    def fetchMore(self, parent):
+        """Inherited from QAbstractItemModel. Read the page just past the
+        last row.
+        """
+        if not self.canFetchMore(parent):
+            return
+        page = self.total // self.pageSize
+        if page not in self.pages:
+            self.readPage(page)
+        self.settle()
+
+    def fetchAll(self):
+        """Read every remaining document of the results."""
+        self.readAll()
+        self.settle()
+
+    def refreshResults(self, first=0, last=0):
+        """Bring the rows up to date after the database has changed. Only
+        the pages holding rows first to last (those in view) are read again
+        now. The rest are forgotten, and read again once they are next shown.
+        A sort done here rather than by Xapian would need every match read
+        again, so it is given up and the rows go back to Xapian's order.
+        Rows whose documents were read again keep their selection.
+        """
+        if self.results is None:
+            return
+        persistent = self.persistentIndexList()
+        docids = []
+        for index in persistent:
+            record = self.record(index.row())
+            docids.append(None if record is None else record.docid)
+        dropped = self.sorting is not None
+        self.clearPages()
+        for page in range(max(first, 0) // self.pageSize,
+                          max(first, last) // self.pageSize + 1):
+            if self.exact is None or page * self.pageSize < self.exact:
+                self.readPage(page)
+        # New rows are added first, and old ones removed last, so that every
+        # row moved to is a valid one
+        if self.countRows() > self.total:
+            self.settle()
+        rows = self.rowsOf()
+        self.layoutAboutToBeChanged.emit()
+        self.changePersistentIndexList(
+            persistent, [index if docid not in rows else
+                         self.index(rows[docid], index.column(), None)
+                         for docid, index in zip(docids, persistent)])
+        self.layoutChanged.emit()
+        self.settle()
+        if dropped:
+            self.sortDropped.emit()
+
+    def record(self, index):
+        """Return the DocRecord shown in a given row, or None if it hasn't
+        been read (or there is no such row).
+        """
+        if index < 0 or index >= self.total:
+            return None
+        if self.order is not None:
+            if index >= len(self.order):
+                return None
+            index = self.order[index]
+        return self.recordAt(index)
 
     def getDoc(self, index):
-        """Return a given document."""
-        return self.docs[index]
+        """Return the DocSnapshot of a given document, which is shared with
+        every other view of it.
+        """
+        if not self.load(index):
+            raise IndexError(index)
+        record = self.record(index)
+        if not isinstance(record.doc, DocSnapshot):
+            # Not read at all if it was already read for another view, or
+            # only read by a SearchWorker or from a cache
+            record.doc = snapshots().get(record.docid, record.doc)
+            if record.doc is None:
+                raise IndexError(index)
+        return record.doc
+
+    def refreshDoc(self, doc):
+        """Show the new DocSnapshot of a document which has changed."""
+        row = self.rowsOf().get(doc.docid)
+        if row is None:
+            return
+        record = self.record(row)
+        record.doc = doc
+        record.load()
+        self.sortKeys = {}
+        self.dataChanged.emit(self.index(row, 0, None),
+                              self.index(row, CONSTS['cols'] - 1, None))
 
     def index(self, row, column, parent):
         """Inheritied from QAbstractItemModel
@@ -197,50 +634,103 @@ class PapersModel(QAbstractItemModel):
     def rowCount(self, unused):
         """Inheritied from QAbstractItemModel
         """
-        return len(self.docs)
+        return self.total
 
     def data(self, index, role):
-        """Inheritied from QAbstractItemModel
+        """Inheritied from QAbstractItemModel. Rows which haven't been read
+        show a placeholder, and are read after painting.
         """
-        doc = self.docs[index.row()]
+        if role == Qt.ToolTipRole:
+            return self.preview(index.row())
         if role != Qt.DisplayRole:
             return None
+        record = self.record(index.row())
+        if record is None:
+            self.want(index.row())
+            if index.column() == 0:
+                return _("Loading...")
+            return None
         if index.column() == 0:
-            return doc.get_title()
+            return record.title
         elif index.column() == 1:
-            auth = doc.get_authors()
-            if len(auth) > 3:
-                return ", ".join(auth[0:2]) + " et al."
-            elif auth:
-                return ", ".join(auth)
-            return ""
+            return record.authors
         elif index.column() == 2:
-            return doc.get_year()
+            return record.year
         elif index.column() == 3:
-            f = doc.get_files()
-            # If len(f) > 0 we will insert a button instead
-            if not f:
+            # If there are files we will insert a button instead
+            if not record.files:
                 return "No PDF found"
             return None
         return None
 
+    def preview(self, row):
+        """Return markup showing the first page of a document's PDF, if its
+        thumbnail is ready. If it isn't, it is rendered in the background,
+        and any other thumbnail still waiting is forgotten about.
+        """
+        record = self.record(row)
+        if self.thumbnails is None or record is None or not record.files:
+            return None
+        try:
+            path = self.getDoc(row).get_fullpaths()[0]
+        except IndexError:
+            return None
+        self.thumbnails.cancel(keep=(path,))
+        self.hoverPath = path
+        thumbnail = self.thumbnails.get(path)
+        if thumbnail is None:
+            return None
+        return previewMarkup(thumbnail)
+
+    def keys(self, which):
+        """Return the sort key of every match, in Xapian's order, for the
+        given column. Every match must have been read. Title and author keys
+        are case-folded, and years are integers so that they sort
+        numerically.
+        """
+        if which not in self.sortKeys:
+            records = [self.recordAt(position)
+                       for position in range(self.exact)]
+            if which == 0:  # Title
+                keys = [(r.title or "").casefold() for r in records]
+            elif which == 1:  # Authors
+                keys = [r.authors.casefold() for r in records]
+            else:  # Years
+                keys = [yearKey(r.year) for r in records]
+            self.sortKeys[which] = keys
+        return self.sortKeys[which]
+
     def sort(self, which, order):
         """Inheritied from QAbstractItemModel.
-        Sort by the appropriate column.
+        Sort by the appropriate column. Where the column is stored in a value
+        slot, Xapian does the sorting and documents are still read a page at
+        a time. Otherwise every match is read and sorted here.
         """
+        if which not in (0, 1, 2) or self.results is None:
+            return
         reverse = (order == Qt.DescendingOrder)
-        if which == 0:  # Title
-            self.layoutAboutToBeChanged.emit()
-            self.docs.sort(key=lambda d: d.get_title(), reverse=reverse)
-            self.layoutChanged.emit()
-        elif which == 1:  # Authors
-            self.layoutAboutToBeChanged.emit()
-            self.docs.sort(key=lambda d: d.get_authors(), reverse=reverse)
-            self.layoutChanged.emit()
-        elif which == 2:  # Years
-            self.layoutAboutToBeChanged.emit()
-            self.docs.sort(key=lambda d: d.get_year(), reverse=reverse)
-            self.layoutChanged.emit()
+        slot = self.results.sortSlot(FIELDS[which])
+        if slot is not None:
+            self.beginResetModel()
+            self.results.setSort(slot, reverse)
+            self.readFirstPage()
+            self.endResetModel()
+            self.countChanged.emit()
+            return
+        # Sorting needs every match, not just those scrolled past so far
+        self.fetchAll()
+        keys = self.keys(which)
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        positions = [self.position(index.row()) for index in persistent]
+        self.order = sorted(range(self.exact), key=keys.__getitem__,
+                            reverse=reverse)
+        self.sorting = (which, reverse)
+        rows = {position: row for row, position in enumerate(self.order)}
+        self.changePersistentIndexList(
+            persistent, [self.index(rows[position], index.column(), None)
+                         for position, index in zip(positions, persistent)])
+        self.layoutChanged.emit()
 
     def headerData(self, section, orientation, role):
         """Inherited from QAbstractItemModel."""
@@ -259,3 +749,8 @@ class PapersModel(QAbstractItemModel):
             return HEADINGS[section]
         return None
 
+
+instrument(PDFDelegate, "paint")
+instrument(PapersTable, "add_results", "openDoc")
+instrument(PapersModel, "setResults", "fetchMore", "refreshResults", "sort",
+           "data")
@@ -0,0 +1,109 @@
+"""A cache of the results of recent searches.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import sys
+from collections import OrderedDict
+
+
+def normalise(query):
+    """Return the query with runs of whitespace collapsed, so that trivially
+    different queries share a cache entry.
+    """
+    return " ".join(query.split())
+
+
+def recordSize(record):
+    """Roughly how many bytes a DocRecord takes up."""
+    return (sys.getsizeof(record) + sys.getsizeof(record.title) +
+            sys.getsizeof(record.authors) + sys.getsizeof(record.year))
+
+
+class QueryCache(object):
+    """Least-recently-used cache mapping a query to the DocRecords of the
+    first page of its results, the estimated number of results, and its
+    facet counts once they have been made. Searches always read their first
+    page in order of relevance, so only that order is cached. Every entry
+    remembers the revision of the database it was read from, and is only
+    returned while the database is still at that revision.
+    """
+    def __init__(self, maxEntries=32, maxBytes=16 * 1024 * 1024):
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes
+        self.size = 0
+        self.entries = OrderedDict()
+
+    def get(self, query, revision):
+        """Return the cached records, estimate and facets (or None if they
+        haven't been counted) for a query, or None if there is nothing for
+        this revision of the database.
+        """
+        key = normalise(query)
+        if key not in self.entries:
+            return None
+        entryRevision, records, estimate, facets, size = self.entries[key]
+        if entryRevision != revision:
+            # The database has changed, so nothing in here can be trusted
+            self.clear()
+            return None
+        self.entries.move_to_end(key)
+        return [record.detached() for record in records], estimate, facets
+
+    def put(self, query, revision, records, estimate=None):
+        """Remember the records and estimate of a query, read at the given
+        revision.
+        """
+        key = normalise(query)
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[4]
+        records = [record.detached() for record in records]
+        size = sum(recordSize(record) for record in records)
+        self.store(key, (revision, records, estimate, None, size))
+
+    def putFacets(self, query, revision, facets):
+        """Add the facet counts of a query to its entry, if the entry was
+        read at the same revision.
+        """
+        key = normalise(query)
+        entry = self.entries.get(key)
+        if entry is None or entry[0] != revision:
+            return
+        self.size -= entry[4]
+        size = entry[4] + 64 * len(facets['year'])
+        size += sum(sys.getsizeof(tag) + 64 for tag in facets['tag'])
+        self.store(key, entry[:3] + (facets, size))
+
+    def store(self, key, entry):
+        """Add an entry, then drop the least recently used entries until
+        everything fits.
+        """
+        if entry[4] > self.maxBytes:
+            self.entries.pop(key, None)
+            return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.size += entry[4]
+        while len(self.entries) > self.maxEntries or self.size > self.maxBytes:
+            self.size -= self.entries.popitem(last=False)[1][4]
+
+    def clear(self):
+        """Forget everything."""
+        self.entries.clear()
+        self.size = 0
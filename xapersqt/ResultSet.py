@@ -0,0 +1,163 @@
+"""Paged access to the results of a search.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import xapian
+from xapers.documents import Document
+
+from xapersqt.PapersDetails import DocRecord
+from xapersqt.Timings import instrument
+
+
+class TagSpy(xapian.MatchSpy):
+    """Counts the tags of every document Xapian matches. stopped, if given,
+    is called every so often, and once it returns True no more documents
+    are looked at.
+    """
+    def __init__(self, prefix, stopped=None):
+        super(TagSpy, self).__init__()
+        self.prefix = prefix
+        self.stopped = stopped
+        self.seen = 0
+        self.stop = False
+        self.counts = {}
+
+    def __call__(self, doc, weight):
+        if self.stop:
+            return
+        self.seen += 1
+        if self.stopped is not None and self.seen % 1000 == 0:
+            self.stop = self.stopped()
+        terms = doc.termlist()
+        try:
+            item = terms.skip_to(self.prefix)
+            while item.term.startswith(self.prefix.encode()):
+                tag = item.term[len(self.prefix):].decode('utf-8', 'replace')
+                self.counts[tag] = self.counts.get(tag, 0) + 1
+                item = next(terms)
+        except StopIteration:
+            pass
+
+
+class ResultSet(object):
+    """The documents matching a query. Unlike Database.search(), which asks
+    Xapian for every match at once, documents are only read one page at a
+    time, when they are asked for.
+    """
+    def __init__(self, db, query, cache=None):
+        self.db = db
+        self.query = query
+        self.cache = cache
+        # Xapian's estimate of how many documents match, as of the last page
+        # read. It gets more accurate as later pages are read.
+        self.estimated = None
+        self.enquire = xapian.Enquire(db.xapian)
+        if query == "*":
+            self.enquire.set_query(xapian.Query.MatchAll)
+        else:
+            self.enquire.set_query(db.query_parser.parse_query(query))
+
+    def sortSlot(self, field):
+        """Return the Xapian value slot holding the given field, or None if
+        the field is not stored in a value slot (and so can't be sorted on by
+        Xapian).
+        """
+        try:
+            return self.db._find_facet(field)
+        except KeyError:
+            return None
+
+    def setSort(self, slot, reverse=False):
+        """Have Xapian order matches by the value in the given slot."""
+        self.enquire.set_sort_by_value(slot, reverse)
+
+    def estimate(self):
+        """Return Xapian's estimate of how many documents match."""
+        return self.enquire.get_mset(0, 0).get_matches_estimated()
+
+    def documents(self, chunk=500):
+        """Yield every matching document in turn. Matches are fetched from
+        Xapian chunk at a time, and each document is only read as it is
+        reached, so memory use doesn't grow with the number of matches.
+        """
+        offset = 0
+        while True:
+            mset = self.enquire.get_mset(offset, chunk)
+            for match in mset:
+                yield Document(self.db, match.document)
+            if mset.size() < chunk:
+                return
+            offset += chunk
+
+    def facets(self, stopped=None):
+        """Return the number of matches with each tag and each year, or None
+        if stopped (see TagSpy) said to give up. The counts are made by
+        match spies while Xapian checks every match, which is much slower
+        than reading a page, so this is done separately from that.
+        """
+        tags = TagSpy(self.db._find_prefix('tag'), stopped)
+        self.enquire.add_matchspy(tags)
+        slot = self.sortSlot('year')
+        years = None
+        if slot is not None:
+            years = xapian.ValueCountMatchSpy(slot)
+            self.enquire.add_matchspy(years)
+        try:
+            self.enquire.get_mset(0, 0, self.db.xapian.get_doccount())
+        finally:
+            self.enquire.clear_matchspies()
+        if tags.stop:
+            return None
+        facets = {'tag': tags.counts, 'year': {}}
+        if years is not None:
+            for item in years.values():
+                year = int(xapian.sortable_unserialise(item.term))
+                facets['year'][year] = item.termfreq
+        return facets
+
+    def records(self, offset, count):
+        """Return a list of DocRecords for at most count documents, starting
+        from the match at position offset. Where a DisplayCache is in use,
+        only documents which are not in it are read from Xapian.
+        """
+        mset = self.enquire.get_mset(offset, count)
+        self.estimated = mset.get_matches_estimated()
+        if self.cache is None:
+            return [DocRecord(Document(self.db, match.document))
+                    for match in mset]
+        self.cache.validate(self.db.xapian.get_revision())
+        matches = list(mset)
+        cached = self.cache.get([match.docid for match in matches])
+        records = []
+        missing = []
+        for match in matches:
+            if match.docid in cached:
+                record = DocRecord.fromFields(match.docid,
+                                              *cached[match.docid])
+            else:
+                record = DocRecord(Document(self.db, match.document))
+                missing.append(record)
+            records.append(record)
+        if missing:
+            self.cache.put(missing)
+        return records
+
+
+instrument(ResultSet, "records", "facets")
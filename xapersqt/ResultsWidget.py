@@ -21,26 +21,82 @@
 
 
 from PyQt5.QtWidgets import QStackedWidget
+from PyQt5.QtCore import QThreadPool, pyqtSignal
 
+from xapersqt.DbWatcher import DbWatcher
+from xapersqt.DisplayCache import DisplayCache
+from xapersqt.QueryCache import QueryCache
+from xapersqt.Snapshots import snapshots
+from xapersqt.Timings import instrument
 from xapersqt.ui_ResultsWidget import Ui_ResultsWidget
 
 
 class ResultsWidget(QStackedWidget):
     """The widget in the results window which lists all the results."""
+    # Emitted when a search is sent to the worker thread
+    searchStarted = pyqtSignal()
+    # Emitted when the latest search has finished, with a message saying how
+    # it went
+    searchFinished = pyqtSignal(str)
+    # Emitted with the tag and year counts of the latest search
+    facetsReady = pyqtSignal(object)
+    # Emitted with a description of how many results there are, whenever
+    # that changes
+    countChanged = pyqtSignal(str)
+
     def __init__(self, parent):
         super(ResultsWidget, self).__init__()
         self.settings = None
         self.parent = parent
         self.db = None
-        self.children = []
+        # Searches run one at a time in their own thread. Each is numbered,
+        # so that results of searches which have since been superseded can
+        # be thrown away.
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        # Counting facets means checking every match, so is done afterwards
+        # in a pool of its own, which first pages never wait behind
+        self.facetPool = QThreadPool()
+        self.facetPool.setMaxThreadCount(1)
+        self.generation = 0
+        self.query = None
+        self.revision = None
+        # Whether the latest search has already been run again because its
+        # worker saw a different revision of the database from ours
+        self.retried = False
+        # Whether the table takes the focus when the latest search finishes
+        self.focus = False
+        self.cache = QueryCache()
+        self.displayCache = None
+        self.watcher = None
+        # Whether to count tags and years of the matches of each search
+        self.wantFacets = False
         self.ui = Ui_ResultsWidget()
         self.ui.setupUi(self)
         self.setCurrentIndex(0)
         self.papers = self.ui.papersTable
+        self.papers.model.countChanged.connect(self.modelCounted)
 
     def setDb(self, db):
         """Set the database object."""
         self.db = db
+        snapshots().setDb(db)
+        if self.displayCache is not None:
+            self.displayCache.close()
+        self.displayCache = DisplayCache(db.xapian.get_uuid())
+        self.watcher = DbWatcher(db)
+        self.watcher.changed.connect(self.dbChanged)
+
+    def dbChanged(self):
+        """The database was changed, possibly by another program, so update
+        the results being shown.
+        """
+        snapshots().revalidate()
+        self.papers.refreshResults()
+        if not self.papers.model.rowCount(None):
+            self.setCurrentIndex(0)
+        elif self.currentIndex() == 0 and self.query is not None:
+            self.setCurrentIndex(1)
 
     def setSettings(self, settings):
         """Set the settings object."""
@@ -48,16 +104,105 @@ class ResultsWidget(QStackedWidget):
             self.settings = settings
             self.papers.set_settings(self.settings)
 
-    def doSearch(self, searchString=""):
+    def doSearch(self, searchString="", retry=False, focus=False):
         """Run a search with the given string. No results are directly
-        returned, instead they are displayed in the table inside this widget.
+        returned, instead the search runs in a worker thread and the results
+        are displayed in the table inside this widget once it finishes. With
+        focus, the table then takes the focus.
+        """
+        self.generation += 1
+        self.retried = retry
+        self.focus = focus
+        # Searches which haven't started yet are already out of date
+        self.pool.clear()
+        self.facetPool.clear()
+        self.query = searchString
+        # Catch up with changes made elsewhere, so that the cache is checked
+        # against the database as it is now.
+        self.db.xapian.reopen()
+        self.revision = self.db.xapian.get_revision()
+        cached = self.cache.get(searchString, self.revision)
+        if cached is not None:
+            records, estimate, facets = cached
+            self.showResults(records, estimate, focus)
+            if facets is not None:
+                self.facetsReady.emit(facets)
+            elif self.wantFacets:
+                self.countFacets()
+            return
+        # Imported here, as Xapian isn't needed until the first search
+        from xapersqt.SearchWorker import SearchWorker
+        worker = SearchWorker(self.db.root, searchString, self.generation,
+                              self.papers.model.pageSize, self.displayCache,
+                              lambda: self.generation)
+        worker.signals.finished.connect(self.searchDone)
+        worker.signals.failed.connect(self.searchFailed)
+        self.searchStarted.emit()
+        self.pool.start(worker)
+
+    def searchDone(self, generation, records, estimate, revision):
+        """Show the first page of results of a search, if it is still the
+        latest one. Later pages are read through our own handle, so it is
+        brought to the revision the first page was read at. If it can't be
+        (the database changed again in between), the search is run once
+        more, so that the pages follow on from each other.
+        """
+        if generation != self.generation:
+            return
+        if revision != self.revision:
+            self.db.xapian.reopen()
+            self.revision = self.db.xapian.get_revision()
+            if revision != self.revision and not self.retried:
+                self.doSearch(self.query, retry=True, focus=self.focus)
+                return
+        self.cache.put(self.query, revision, records, estimate)
+        self.showResults(records, estimate, self.focus)
+        if self.wantFacets:
+            self.countFacets()
+
+    def countFacets(self):
+        """Start counting the tags and years of the latest search's matches.
+        The counts are dropped if another search starts first.
         """
-        docs = self.db.search(searchString)
-        if not docs:
+        from xapersqt.SearchWorker import FacetWorker
+        self.facetPool.clear()
+        worker = FacetWorker(self.db.root, self.query, self.generation,
+                             lambda: self.generation)
+        worker.signals.finished.connect(self.facetsDone)
+        self.facetPool.start(worker)
+
+    def facetsDone(self, generation, facets, revision):
+        """Show the facet counts of a search, if it is still the latest."""
+        if generation != self.generation:
+            return
+        self.cache.putFacets(self.query, revision, facets)
+        self.facetsReady.emit(facets)
+
+    def showResults(self, records, estimate=None, focus=False):
+        """Show the results of the latest search, given the DocRecords of the
+        first page of them and the estimated number of results. With focus,
+        the table takes the focus.
+        """
+        from xapersqt.ResultSet import ResultSet
+        results = ResultSet(self.db, self.query, self.displayCache)
+        self.papers.add_results(results, records, estimate, focus)
+        if not self.papers.model.rowCount(None):
             self.setCurrentIndex(0)
         else:
-            self.papers.add_results(docs)
             self.setCurrentIndex(1)
+        self.searchFinished.emit("")
+
+    def modelCounted(self):
+        """Pass on how many results there are now."""
+        self.countChanged.emit(self.papers.model.countText())
+
+    def searchFailed(self, generation, message):
+        """Report a search which could not be run, if it is still the latest
+        one.
+        """
+        if generation != self.generation:
+            return
+        self.searchFinished.emit(message)
 
     def saveSettings(self):
         """Save the settings of the table of results.
@@ -80,8 +225,12 @@ class ResultsWidget(QStackedWidget):
         """Open the highlighted document. This creates a new window allowing
         the user to edit the data relating to said document.
         """
-        self.children.append(self.papers.openDoc())
+        self.papers.openDoc()
 
     def refresh(self):
         """Refresh the view."""
         self.papers.refresh()
+
+
+instrument(ResultsWidget, "doSearch", "searchDone", "showResults",
+           "facetsDone")
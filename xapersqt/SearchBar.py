@@ -20,8 +20,10 @@
 # be raised at https://github.com/WPettersson/xapers-qt/
 
 
+from xapersqt.Completions import CompletionIndex, IndexBuilder
 from xapersqt.ui_SearchBar import Ui_SearchBar
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import QWidget, QCompleter
+from PyQt5.QtCore import QTimer, QThreadPool, QStringListModel
 
 
 class SearchBar(QWidget):
@@ -33,8 +35,87 @@ class SearchBar(QWidget):
         self.parent = parent.parent()
         self.ui = Ui_SearchBar()
         self.ui.setupUi(self)
-        self.ui.searchButton.clicked.connect(self.parent.startSearch)
-        self.ui.searchLine.returnPressed.connect(self.parent.startSearch)
+        self.incremental = True
+        # Restarted on every edit, so that a search only starts once typing
+        # has paused
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(300)
+        self.timer.timeout.connect(self.parent.startSearch)
+        self.ui.searchButton.clicked.connect(self.searchNow)
+        self.ui.searchLine.returnPressed.connect(self.searchNow)
+        self.ui.searchLine.textChanged.connect(self.textChanged)
+        # Suggestions for the word being typed, from an index which is
+        # built in the background and rebuilt when the database changes
+        self.dbpath = None
+        self.index = CompletionIndex()
+        self.building = False
+        self.stale = False
+        self.suggestions = QStringListModel(self)
+        self.completer = QCompleter(self.suggestions, self)
+        self.completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.completer.setWidget(self.ui.searchLine)
+        self.completer.activated[str].connect(self.ui.searchLine.setText)
+        self.ui.searchLine.textEdited.connect(self.suggest)
+
+    def setSettings(self, settings):
+        """Read whether to search as the user types, and how long to wait
+        after the last key press before doing so, from the settings.
+        """
+        self.incremental = settings.value("search/incremental", True,
+                                          type=bool)
+        try:
+            self.timer.setInterval(int(settings.value("search/delay", 300)))
+        except ValueError:
+            self.timer.setInterval(300)
+
+    def setDb(self, db, watcher):
+        """Build the index of suggestions for db, and rebuild it whenever
+        watcher sees the database change.
+        """
+        self.dbpath = db.root
+        watcher.changed.connect(self.buildIndex)
+        self.buildIndex()
+
+    def buildIndex(self):
+        """Start building the index of suggestions, unless it is already
+        being built, in which case it is built again afterwards.
+        """
+        if self.building:
+            self.stale = True
+            return
+        self.building = True
+        self.stale = False
+        builder = IndexBuilder(self.dbpath)
+        builder.signals.built.connect(self.indexBuilt)
+        QThreadPool.globalInstance().start(builder)
+
+    def indexBuilt(self, index):
+        """Use a newly built index of suggestions."""
+        self.index = index
+        self.building = False
+        if self.stale:
+            self.buildIndex()
+
+    def suggest(self, text):
+        """Show suggestions for the word being typed."""
+        completions = self.index.complete(text)
+        self.suggestions.setStringList(completions)
+        if completions:
+            self.completer.complete()
+        else:
+            self.completer.popup().hide()
+
+    def textChanged(self, unused):
+        """(Re)start the wait before searching for the new text."""
+        if self.incremental:
+            self.timer.start()
+
+    def searchNow(self):
+        """Search straight away, rather than waiting for typing to pause."""
+        self.timer.stop()
+        self.completer.popup().hide()
+        self.parent.startSearch(focus=True)
 
     def text(self):
         """Return the current search query term."""
@@ -0,0 +1,144 @@
+"""Running searches away from the GUI thread.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import threading
+
+from PyQt5.QtCore import QObject, QRunnable, QThread, pyqtSignal
+from xapers import Database
+
+from xapersqt.ResultSet import ResultSet
+from xapersqt.Timings import instrument
+
+
+# Read-only handles by thread and database path. PyQt gives each run() of
+# a QRunnable fresh thread-local state, so they are kept here instead, for
+# the next run on the same pool thread.
+_handles = {}
+_handlesLock = threading.Lock()
+
+
+def readDatabase(dbpath):
+    """Return the calling thread's own read-only handle on the database at
+    dbpath, brought up to date with the latest revision. Xapian handles can't
+    be used by two threads at once, so each worker thread opens its own.
+    """
+    key = (threading.get_ident(), dbpath)
+    with _handlesLock:
+        db = _handles.get(key)
+    if db is not None:
+        db.xapian.reopen()
+        return db
+    db = Database(dbpath)
+    with _handlesLock:
+        _handles[key] = db
+    return db
+
+
+class SearchSignals(QObject):
+    """The signals of a SearchWorker. QRunnable is not a QObject, so can't
+    have signals of its own.
+    """
+    # The generation of the search, the DocRecords of the first page, the
+    # estimated number of matches, and the revision of the database they
+    # were read at
+    finished = pyqtSignal(int, object, object, object)
+    # The generation of the search, and a description of what went wrong
+    failed = pyqtSignal(int, str)
+
+
+class SearchWorker(QRunnable):
+    """Runs a query in a thread pool, reading the first page of results.
+    latest, if given, is called between steps and returns the generation of
+    the latest search; once that isn't this one, the worker gives up.
+    """
+    def __init__(self, dbpath, query, generation, pageSize, cache=None,
+                 latest=None):
+        super(SearchWorker, self).__init__()
+        self.dbpath = dbpath
+        self.query = query
+        self.cache = cache
+        self.generation = generation
+        self.pageSize = pageSize
+        self.latest = latest
+        self.signals = SearchSignals()
+
+    def superseded(self):
+        """Whether a newer search has been started since this one."""
+        return self.latest is not None and self.latest() != self.generation
+
+    def run(self):
+        """Inherited from QRunnable."""
+        if self.superseded():
+            return
+        try:
+            db = readDatabase(self.dbpath)
+            revision = db.xapian.get_revision()
+            results = ResultSet(db, self.query, self.cache)
+            records = results.records(0, self.pageSize)
+        except Exception as e:  # pylint: disable=broad-except
+            self.signals.failed.emit(self.generation, str(e))
+            return
+        if self.superseded():
+            return
+        # The documents belong to this thread's handle, so don't let them
+        # escape to the GUI thread. They are read again there if needed.
+        for record in records:
+            record.doc = None
+        self.signals.finished.emit(self.generation, records,
+                                   results.estimated, revision)
+
+
+class FacetSignals(QObject):
+    """The signals of a FacetWorker."""
+    # The generation of the search, the facet counts, and the revision of
+    # the database they were counted at
+    finished = pyqtSignal(int, object, object)
+
+
+class FacetWorker(SearchWorker):
+    """Counts the tags and years of every match of a query, in a thread pool
+    of its own so that it never holds up the first page of a search. It
+    gives up, without emitting anything, once a newer search has started.
+    """
+    def __init__(self, dbpath, query, generation, latest=None):
+        super(FacetWorker, self).__init__(dbpath, query, generation, 0,
+                                          latest=latest)
+        self.signals = FacetSignals()
+
+    def run(self):
+        """Inherited from QRunnable."""
+        if self.superseded():
+            return
+        QThread.currentThread().setPriority(QThread.LowPriority)
+        try:
+            db = readDatabase(self.dbpath)
+            revision = db.xapian.get_revision()
+            facets = ResultSet(db, self.query).facets(self.superseded)
+        except Exception:  # pylint: disable=broad-except
+            # The search itself reports what is wrong with the query
+            return
+        if facets is None or self.superseded():
+            return
+        self.signals.finished.emit(self.generation, facets, revision)
+
+
+instrument(SearchWorker, "run")
+instrument(FacetWorker, "run")
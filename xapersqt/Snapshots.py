@@ -0,0 +1,160 @@
+"""Read-only snapshots of documents, shared by every view of them.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import weakref
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+_snapshots = None
+
+
+def snapshots():
+    """The Snapshots shared by every window."""
+    global _snapshots  # pylint: disable=global-statement
+    if _snapshots is None:
+        _snapshots = Snapshots()
+    return _snapshots
+
+
+class DocSnapshot(object):
+    """Everything the views show of one document, read from Xapian in one go
+    and never changed afterwards. It answers the same get_*() calls as a
+    Xapers Document, so it can be read in the same way.
+    """
+    __slots__ = ('docid', 'key', 'title', 'authors', 'year', 'files',
+                 'paths', 'tags', '__weakref__')
+
+    def __init__(self, doc):
+        self.docid = doc.docid
+        self.key = doc.get_key()
+        self.title = doc.get_title()
+        self.authors = tuple(doc.get_authors())
+        self.year = doc.get_year()
+        self.files = tuple(doc.get_files())
+        self.paths = tuple(doc.get_fullpaths())
+        self.tags = tuple(doc.get_tags())
+
+    def fields(self):
+        """Return every field as a tuple."""
+        return (self.key, self.title, self.authors, self.year, self.files,
+                self.paths, self.tags)
+
+    def get_key(self):
+        """As Document.get_key()."""
+        return self.key
+
+    def get_title(self):
+        """As Document.get_title()."""
+        return self.title
+
+    def get_authors(self):
+        """As Document.get_authors()."""
+        return list(self.authors)
+
+    def get_year(self):
+        """As Document.get_year()."""
+        return self.year
+
+    def get_files(self):
+        """As Document.get_files()."""
+        return list(self.files)
+
+    def get_fullpaths(self):
+        """As Document.get_fullpaths()."""
+        return list(self.paths)
+
+    def get_tags(self):
+        """As Document.get_tags()."""
+        return list(self.tags)
+
+
+class Snapshots(QObject):
+    """An identity map from docid to the DocSnapshot of that document, so
+    that every view showing a document shares one snapshot, read once per
+    revision of the database. Snapshots are only kept while some view holds
+    on to them.
+    """
+    # Emitted with the new snapshot of a document which has changed
+    changed = pyqtSignal(object)
+
+    def __init__(self):
+        super(Snapshots, self).__init__()
+        self.db = None
+        self.revision = None
+        self.map = weakref.WeakValueDictionary()
+
+    def setDb(self, db):
+        """Set the (read-only) database documents are read from."""
+        self.db = db
+        self.revision = db.xapian.get_revision()
+        self.map.clear()
+
+    def get(self, docid, doc=None):
+        """Return the snapshot of document docid, or None if there is no
+        such document. doc, if given, is the document already read by the
+        caller, and is used rather than reading it again.
+        """
+        self.revalidate()
+        snapshot = self.map.get(docid)
+        if snapshot is None:
+            if doc is None:
+                doc = self.db[docid]
+                if doc is None:
+                    return None
+            snapshot = self.map[docid] = DocSnapshot(doc)
+        return snapshot
+
+    def refresh(self, docid):
+        """Read document docid again, after it was changed through another
+        handle, and tell every view about it. The read-only handle is
+        reopened first, so that it sees the change. Returns the new snapshot,
+        or None if the document is gone.
+        """
+        self.db.xapian.reopen()
+        self.revalidate()
+        return self.reread(docid)
+
+    def reread(self, docid):
+        """Read document docid again, emitting changed if it did."""
+        old = self.map.get(docid)
+        doc = self.db[docid]
+        if doc is None:
+            self.map.pop(docid, None)
+            return None
+        snapshot = DocSnapshot(doc)
+        if old is not None and old.fields() == snapshot.fields():
+            return old
+        self.map[docid] = snapshot
+        self.changed.emit(snapshot)
+        return snapshot
+
+    def revalidate(self):
+        """If the database has moved on to a new revision, read every
+        document which is still being shown again.
+        """
+        revision = self.db.xapian.get_revision()
+        if revision == self.revision:
+            return
+        self.revision = revision
+        for docid in list(self.map.keys()):
+            self.reread(docid)
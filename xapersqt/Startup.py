@@ -0,0 +1,99 @@
+"""Measuring how long the program takes to start.
+
+Only stdlib modules are imported here, so that this can be imported before
+everything it measures.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import sys
+import time
+import builtins
+
+
+class StartupProfile(object):
+    """Records how long each step of starting up takes, and how long each
+    module took to import the first time it was asked for (including the
+    modules it imported in turn).
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.steps = []
+        self.imports = {}
+        self.original = None
+
+    def watchImports(self):
+        """Start timing imports of modules which haven't been imported yet.
+        """
+        self.original = builtins.__import__
+        original = self.original
+        imports = self.imports
+        clock = time.perf_counter
+
+        def timedImport(name, *args, **kwargs):
+            if name in sys.modules or name in imports:
+                return original(name, *args, **kwargs)
+            imports[name] = None  # Don't time its own nested import of itself
+            start = clock()
+            try:
+                return original(name, *args, **kwargs)
+            finally:
+                imports[name] = clock() - start
+        builtins.__import__ = timedImport
+
+    def stopWatching(self):
+        """Stop timing imports."""
+        if self.original is not None:
+            builtins.__import__ = self.original
+            self.original = None
+
+    def mark(self, step):
+        """Record that a step of starting up has just finished."""
+        now = time.perf_counter()
+        self.steps.append((step, now - self.last, now - self.start))
+        self.last = now
+
+    def report(self, out=None, slowest=15):
+        """Write how long each step took, and the slowest imports."""
+        out = out or sys.stderr
+        out.write("Startup:\n")
+        for step, took, total in self.steps:
+            out.write("  %-32s %8.1fms %8.1fms\n" % (step, took * 1000,
+                                                     total * 1000))
+        timed = [(took, name) for name, took in self.imports.items()
+                 if took is not None]
+        timed.sort(reverse=True)
+        out.write("Slowest imports (including what they import):\n")
+        for took, name in timed[:slowest]:
+            out.write("  %-32s %8.1fms\n" % (name, took * 1000))
+        out.flush()
+
+
+def fromArguments(argv):
+    """Return a StartupProfile, already watching imports, if
+    --profile-startup is in argv (removing it), or None otherwise.
+    """
+    if "--profile-startup" not in argv:
+        return None
+    argv.remove("--profile-startup")
+    profile = StartupProfile()
+    profile.watchImports()
+    return profile
@@ -0,0 +1,168 @@
+"""Pictures of the first page of PDFs.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import os
+import hashlib
+import subprocess
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+_thumbnails = None
+
+
+def thumbnails():
+    """The Thumbnails shared by every window."""
+    global _thumbnails  # pylint: disable=global-statement
+    if _thumbnails is None:
+        _thumbnails = Thumbnails()
+    return _thumbnails
+
+
+def thumbnailDir():
+    """The directory thumbnails are kept in."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'thumbnails', 'xapers-qt')
+
+
+def thumbnailPath(path, size):
+    """Where the thumbnail of the PDF at path is kept. The name depends on
+    the modification time and size of the PDF, so a changed PDF gets a new
+    thumbnail.
+    """
+    info = os.stat(path)
+    key = "%s\0%d\0%d\0%d" % (path, info.st_mtime_ns, info.st_size, size)
+    name = hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+    return os.path.join(thumbnailDir(), name + '.png')
+
+
+class RenderSignals(QObject):
+    """The signals of a RenderWorker."""
+    # The PDF, and its thumbnail (or an empty string if it couldn't be made)
+    done = pyqtSignal(str, str)
+
+
+class RenderWorker(QRunnable):
+    """Renders the first page of a PDF to a PNG with pdftoppm, from the
+    same poppler tools which Xapers uses to read PDFs.
+    """
+    def __init__(self, path, target, size):
+        super(RenderWorker, self).__init__()
+        self.path = path
+        self.target = target
+        self.size = size
+        self.signals = RenderSignals()
+        # Kept alive by Thumbnails, so it can be taken back off the queue
+        self.setAutoDelete(False)
+
+    def run(self):
+        """Inherited from QRunnable."""
+        prefix = self.target[:-len('.png')] + '.part'
+        try:
+            os.makedirs(os.path.dirname(self.target), exist_ok=True)
+            subprocess.run(['pdftoppm', '-f', '1', '-l', '1', '-singlefile',
+                            '-png', '-scale-to', str(self.size), self.path,
+                            prefix],
+                           stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=30, check=True)
+            os.replace(prefix + '.png', self.target)
+        except (OSError, subprocess.SubprocessError):
+            self.signals.done.emit(self.path, "")
+            return
+        self.signals.done.emit(self.path, self.target)
+
+
+class Thumbnails(QObject):
+    """Thumbnails of PDFs, rendered in a thread pool and kept on disk. The
+    least recently used thumbnails are removed once they take up more than
+    maxBytes.
+    """
+    # Emitted with the path of a PDF whose thumbnail has been rendered
+    ready = pyqtSignal(str)
+
+    def __init__(self, size=256, maxBytes=100 * 1024 * 1024):
+        super(Thumbnails, self).__init__()
+        self.size = size
+        self.maxBytes = maxBytes
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max(1, (os.cpu_count() or 2) // 2))
+        self.pending = {}
+        self.rendered = 0
+
+    def get(self, path):
+        """Return the path of the thumbnail of the PDF at path, if there is
+        one. If not, start rendering it and return None. ready is emitted
+        once it is done.
+        """
+        try:
+            target = thumbnailPath(path, self.size)
+        except OSError:
+            return None
+        if os.path.exists(target):
+            # Bump it to the end of the queue for removal
+            os.utime(target, None)
+            return target
+        if path not in self.pending:
+            worker = RenderWorker(path, target, self.size)
+            worker.signals.done.connect(self.done)
+            self.pending[path] = worker
+            self.pool.start(worker)
+        return None
+
+    def cancel(self, keep=()):
+        """Stop rendering thumbnails, except for those of the PDFs in keep,
+        if they haven't started yet.
+        """
+        for path, worker in list(self.pending.items()):
+            if path not in keep and self.pool.tryTake(worker):
+                del self.pending[path]
+
+    def done(self, path, target):
+        """A thumbnail finished rendering."""
+        self.pending.pop(path, None)
+        if not target:
+            return
+        self.rendered += 1
+        if self.rendered % 20 == 0:
+            self.prune()
+        self.ready.emit(path)
+
+    def prune(self):
+        """Remove the least recently used thumbnails until they fit in
+        maxBytes.
+        """
+        directory = thumbnailDir()
+        entries = []
+        for name in os.listdir(directory):
+            try:
+                info = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+        total = sum(size for mtime, size, name in entries)
+        for mtime, size, name in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+            total -= size
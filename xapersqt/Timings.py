@@ -0,0 +1,203 @@
+"""Timing the hot paths of the program.
+
+Methods are registered with instrument(), but are only wrapped while timing
+is enabled, so that nothing at all is added to them otherwise. Timing is
+enabled from the Debug menu, or by setting XAPERSQT_PROFILE in the
+environment. If that is set to a file name rather than 1, a Chrome trace
+(for chrome://tracing or Perfetto) is written there on exit.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+
+import os
+import json
+import time
+import threading
+import functools
+from collections import deque
+
+
+ENVIRONMENT = "XAPERSQT_PROFILE"
+# Durations kept per name for the percentiles, and trace events kept in all
+MAX_SAMPLES = 10000
+MAX_EVENTS = 500000
+
+_lock = threading.Lock()
+_targets = []
+_stats = {}
+_events = []
+_enabled = False
+_origin = time.perf_counter()
+
+
+class Counter(object):
+    """The calls made to one instrumented method."""
+    __slots__ = ('calls', 'total', 'samples')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, elapsed):
+        """Count one call, which took elapsed seconds."""
+        self.calls += 1
+        self.total += elapsed
+        self.samples.append(elapsed)
+
+    def percentile(self, fraction):
+        """Return the given percentile, as a fraction, of the recent
+        durations.
+        """
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[int(round(fraction * (len(ordered) - 1)))]
+
+
+class Target(object):
+    """A method which is timed while timing is enabled."""
+    __slots__ = ('cls', 'attribute', 'name', 'original')
+
+    def __init__(self, cls, attribute, name):
+        self.cls = cls
+        self.attribute = attribute
+        self.name = name
+        # Only methods written in Python, as Qt remembers which of its
+        # virtual methods a class doesn't reimplement
+        self.original = cls.__dict__[attribute]
+
+    def wrap(self):
+        """Replace the method with one which times it."""
+        setattr(self.cls, self.attribute, timer(self.original, self.name))
+
+    def unwrap(self):
+        """Put the method back as it was."""
+        setattr(self.cls, self.attribute, self.original)
+
+
+def timer(function, name):
+    """Return function wrapped so that each call is recorded under name."""
+    clock = time.perf_counter
+
+    @functools.wraps(function)
+    def timed(*args, **kwargs):
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, start, clock())
+    return timed
+
+
+def record(name, start, end):
+    """Record a call to name, from start to end (as perf_counter() times)."""
+    with _lock:
+        counter = _stats.get(name)
+        if counter is None:
+            counter = _stats[name] = Counter()
+        counter.add(end - start)
+        if len(_events) < MAX_EVENTS:
+            _events.append((name, start, end, threading.get_ident()))
+
+
+def instrument(cls, *attributes):
+    """Have the named methods of cls timed whenever timing is enabled."""
+    for attribute in attributes:
+        target = Target(cls, attribute, "%s.%s" % (cls.__name__, attribute))
+        _targets.append(target)
+        if _enabled:
+            target.wrap()
+
+
+def enabled():
+    """Whether timing is enabled."""
+    return _enabled
+
+
+def enable():
+    """Start timing the instrumented methods."""
+    global _enabled  # pylint: disable=global-statement
+    if not _enabled:
+        _enabled = True
+        for target in _targets:
+            target.wrap()
+
+
+def disable():
+    """Stop timing, and restore the instrumented methods. What has been
+    recorded so far is kept.
+    """
+    global _enabled  # pylint: disable=global-statement
+    if _enabled:
+        _enabled = False
+        for target in _targets:
+            target.unwrap()
+
+
+def reset():
+    """Forget everything recorded so far."""
+    with _lock:
+        _stats.clear()
+        del _events[:]
+
+
+def fromEnvironment():
+    """Enable timing if asked to by the environment. Returns the path to
+    write a trace to on exit, if one was given.
+    """
+    value = os.environ.get(ENVIRONMENT, "")
+    if value and value != "0":
+        enable()
+    if value not in ("", "0", "1"):
+        return value
+    return None
+
+
+def summary():
+    """Return (name, calls, total, p50, p99) for each name recorded, the
+    slowest in total first. Times are in seconds.
+    """
+    with _lock:
+        rows = [(name, counter.calls, counter.total,
+                 counter.percentile(0.5), counter.percentile(0.99))
+                for name, counter in _stats.items()]
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows
+
+
+def describe(row):
+    """A short description of one row of summary()."""
+    name, calls, total, p50, p99 = row
+    return "%s: %d calls, %.1fms total, p50 %.3fms, p99 %.3fms" % (
+        name, calls, total * 1000, p50 * 1000, p99 * 1000)
+
+
+def saveTrace(path):
+    """Write what has been recorded to path in the Chrome trace format."""
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+    trace = [{"name": name, "cat": "xapers-qt", "ph": "X", "pid": pid,
+              "tid": tid, "ts": (start - _origin) * 1e6,
+              "dur": (end - start) * 1e6}
+             for name, start, end, tid in events]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,61 @@
+"""Short-lived writable access to a Xapers database.
+"""
+# This file is a part of XapersQt - a Qt interface to the Xapers article
+# database system. Copyright (C) 2019 William Pettersson
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# The author can be contacted at william@ewpettersson.se and issues can
+# be raised at https://github.com/WPettersson/xapers-qt/
+
+import time
+from contextlib import contextmanager
+
+import xapian
+from xapers import Database
+from xapers.database import DatabaseLockError
+
+
+# Xapers normally turns Xapian's lock error into its own, but catch both
+LOCK_ERRORS = (DatabaseLockError, xapian.DatabaseLockError)
+
+
+def openWritable(dbpath, attempts=20, delay=0.1):
+    """Open the database at dbpath for writing. If someone else (the xapers
+    command, a sync job or another xapers-qt) holds the write lock, keep
+    trying for a little while before giving up.
+    """
+    for attempt in range(attempts):
+        try:
+            return Database(dbpath, writable=True)
+        except LOCK_ERRORS:
+            if attempt == attempts - 1:
+                raise
+            time.sleep(delay)
+
+
+@contextmanager
+def writableDatabase(db, attempts=20, delay=0.1):
+    """Context manager giving a writable handle on the same database as the
+    read-only handle db. The write lock is only held inside the with block.
+    Changes are committed on leaving it, and db is then reopened so that it
+    sees them.
+    """
+    wdb = openWritable(db.root, attempts, delay)
+    try:
+        yield wdb
+        wdb.xapian.commit()
+    finally:
+        wdb.xapian.close()
+        db.xapian.reopen()
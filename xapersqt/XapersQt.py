@@ -18,12 +18,38 @@
 # be raised at https://github.com/WPettersson/xapers-qt/
 
 from PyQt5.QtWidgets import QApplication
-from xapers import Database
+from PyQt5.QtCore import QTimer
 from xapersqt.MainWindow import MainWindow
 
 
 class XapersQt(QApplication):
-    def __init__(self, argv, dbpath, keybinds):
-        self.db = Database(dbpath, writable=True)
+    def __init__(self, argv, dbpath, keybinds, profile=None):
         super(XapersQt, self).__init__(argv)
-        self.m = MainWindow(self.db, keybinds)
+        self.dbpath = dbpath
+        self.profile = profile
+        self.db = None
+        self.mark("QApplication created")
+        # Show the window straight away, and only then open the database
+        self.m = MainWindow(None, keybinds)
+        self.mark("main window shown")
+        QTimer.singleShot(0, self.openDatabase)
+
+    def mark(self, step):
+        """Record a step of starting up, if startup is being profiled."""
+        if self.profile is not None:
+            self.profile.mark(step)
+
+    def openDatabase(self):
+        """Open the database, and hand it to the main window."""
+        self.mark("first events handled")
+        from xapers import Database
+        self.mark("xapers imported")
+        # Only ever read through this handle, so that the write lock is
+        # free for anyone else. See Writable for how changes are made.
+        self.db = Database(self.dbpath)
+        self.mark("database opened")
+        self.m.setDb(self.db)
+        self.mark("interactive")
+        if self.profile is not None:
+            self.profile.stopWatching()
+            self.profile.report()
@@ -20,17 +20,20 @@
 # be raised at https://github.com/WPettersson/xapers-qt/
 
 import sys
-import xapers
-from xapersqt.XapersQt import XapersQt
+from xapersqt.Startup import fromArguments
 
 
 def __main__():
+    profile = fromArguments(sys.argv)
+    from xapersqt.XapersQt import XapersQt
+    if profile is not None:
+        profile.mark("modules imported")
     db = '~/.xapers/docs'
 
     keybinds = [["Ctrl+L", "Search"], ["j", "Next"], ["k", "Prev"],
                 ["Enter", "OpenPDF"], ["o", "OpenDoc"],
                 ["Esc", "Exit"], ["Ctrl+q", "Exit"]]
-    app = XapersQt(sys.argv, db, keybinds)
+    app = XapersQt(sys.argv, db, keybinds, profile)
     sys.exit(app.exec_())
 
 
@@ -39,9 +39,16 @@ class Ui_DocWindow(object):
         self.tag_list = QtWidgets.QLabel(Ui_DocWindow)
         self.tag_list.setObjectName("tag_list")
         self.verticalLayout_2.addWidget(self.tag_list)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
         self.pdf_list = PDFList(Ui_DocWindow)
         self.pdf_list.setObjectName("pdf_list")
-        self.verticalLayout_2.addWidget(self.pdf_list)
+        self.horizontalLayout.addWidget(self.pdf_list)
+        self.preview = QtWidgets.QLabel(Ui_DocWindow)
+        self.preview.setText("")
+        self.preview.setObjectName("preview")
+        self.horizontalLayout.addWidget(self.preview)
+        self.verticalLayout_2.addLayout(self.horizontalLayout)
         self.buttonBox = QtWidgets.QDialogButtonBox(Ui_DocWindow)
         self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Discard|QtWidgets.QDialogButtonBox.Save)
         self.buttonBox.setObjectName("buttonBox")